@@ -1,11 +1,21 @@
 import os
+import re
 import asyncio
 import logging
+import itertools
 from datetime import datetime
 from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 from dotenv import load_dotenv
 from inspector import Inspector
-from enums import PlayerCountMap
+from enums import PlayerCountMap, HolesMap
+from jobs import BookingJob
+from trace_report import tracing_enabled, start_tracing, stop_tracing
+from timeouts import TimeoutManager, FIXED_TIMEOUTS
+from step_graph import StepGraph, StepError, run_graph
+from telemetry import NetworkTelemetry, telemetry_enabled, DEFAULT_TELEMETRY_PATH
+from foreup_api import http_login, http_login_enabled, inject_session, direct_booking_enabled, submit_booking, matching_slots, slot_time, TeeSheetCapture, HoldTracker, ReservationUnconfirmed
+from commit_guard import CommitGuard, CommitLost, NoCandidate, RaceCandidates, race_candidates
+from navigator import booking_page_url, PUBLIC_TEE_TIMES_SELECTOR, navigate_to_tee_sheet
 
 load_dotenv()
 
@@ -16,6 +26,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class SlotUnavailable(Exception):
+    """
+    Raised when the tee time a job targets is no longer on the tee sheet.
+    """
+
 async def select_day(page, date_str):
     """
     Selects the specified day in the calendar.
@@ -57,14 +72,79 @@ async def select_day(page, date_str):
         logger.error(f"Error selecting date in calendar: {str(e)}")
         raise # Re-raise the exception to be caught by the main booking function's error handling
 
-async def select_tee_time(page, time_range_start, time_range_end, players):
+def parse_time_range(time_range_start, time_range_end):
     """
-    Selects a tee time that matches the specified criteria.
+    Parses the 'HH:MM' time window. If the end time is less than the start time, it is assumed to be PM.
     """
-    # Wait for tee times to load after date selection
+    start_time_obj = datetime.strptime(time_range_start, '%H:%M').time()
+    end_time_str = time_range_end
+    if datetime.strptime(end_time_str, '%H:%M').time() < start_time_obj:
+        end_time_str = f"{int(end_time_str.split(':')[0]) + 12}:{end_time_str.split(':')[1]}"
+    end_time_obj = datetime.strptime(end_time_str, '%H:%M').time()
+    return start_time_obj, end_time_obj
+
+def parse_tee_time_text(time_text):
+    """
+    Parses a tee time card label (e.g. '1:57pm' or '13:57') into a time object.
+    """
+    today = datetime.now().date()
+    time_str_lower = time_text.lower()
+    if 'am' in time_str_lower or 'pm' in time_str_lower:
+        tee_time_dt_object = datetime.strptime(f'{today} {time_text}', '%Y-%m-%d %I:%M%p')
+    else:
+        tee_time_dt_object = datetime.strptime(f'{today} {time_text}', '%Y-%m-%d %H:%M')
+    return tee_time_dt_object.time()
+
+async def find_matching_tee_times(page, time_range_start, time_range_end, players):
+    """
+    Returns the tee time cards that match the time window and party size, in page order,
+    as a list of (card, time_text, available_players) tuples.
+    """
+    # Use the correct selector for individual tee time cards
+    tee_time_cards = await page.query_selector_all('.time.time-tile-ob-no-details')
+    if not tee_time_cards:
+        raise Exception("No tee time cards found")
+
+    # Parse the input time range for comparison
+    logger.info(f"Debug - time_range_start: '{time_range_start}'")
+    logger.info(f"Debug - time_range_end: '{time_range_end}'")
+    start_time_obj, end_time_obj = parse_time_range(time_range_start, time_range_end)
+    target_players = int(players)
+
+    matches = []
+    for card in tee_time_cards:
+        try:
+            # Extract time and player count
+            time_element = await card.query_selector('.times-booking-start-time-label')
+            time_text = await time_element.text_content() if time_element else "N/A"
+
+            players_element = await card.query_selector('.time-summary-ob-player-count')
+            players_text = await players_element.text_content() if players_element else "0 Players"
+
+            # Parse tee time
+            tee_time_time_obj = parse_tee_time_text(time_text.strip())
+
+            # Parse available players
+            available_players = int(players_text.split(' Players')[0].strip())
+
+            # Check if this tee time matches our criteria
+            if tee_time_time_obj and start_time_obj <= tee_time_time_obj <= end_time_obj and available_players >= target_players:
+                matches.append((card, time_text.strip(), available_players))
+
+        except Exception as e:
+            logger.warning(f"Error processing tee time card: {e}")
+            continue
+
+    return matches
+
+async def wait_for_tee_time_cards(page, timeouts=None):
+    """
+    Waits for the tee time cards to render after the date was selected.
+    """
+    timeouts = timeouts or FIXED_TIMEOUTS
     try:
         logger.info("Waiting for tee time cards to appear after date selection...")
-        await page.wait_for_selector('.time.time-tile-ob-no-details', timeout=5000)  # Increased timeout to 30 seconds
+        await timeouts.wait('select_tee_time.cards', lambda timeout_ms: page.wait_for_selector('.time.time-tile-ob-no-details', timeout=timeout_ms), 5000)
         logger.info("Tee time cards found successfully after date selection")
     except PlaywrightTimeoutError:
         logger.error("Timeout waiting for tee time cards after date selection")
@@ -72,60 +152,39 @@ async def select_tee_time(page, time_range_start, time_range_end, players):
         content = await page.content()
         logger.info(f"Current page content: {content[:1000]}...")  # Log first 1000 chars
         raise
+
+async def select_tee_time(page, time_range_start, time_range_end, players, timeouts=None, target_time=None, candidates=None, attempt_id=None):
+    """
+    Selects a tee time that matches the specified criteria: the first match, or the
+    match at `target_time` (a card label such as '7:30am') when one is given, or the
+    tee time `candidates` assigns to this racing attempt.
+    Returns the label of the selected tee time.
+    """
+    # Wait for tee times to load after date selection
+    await wait_for_tee_time_cards(page, timeouts)
     logger.info(f"Attempting to select tee time between {time_range_start} and {time_range_end} for {players} players")
     try:
-        # Use the correct selector for individual tee time cards
-        tee_time_cards = await page.query_selector_all('.time.time-tile-ob-no-details')
-        if not tee_time_cards:
-            raise Exception("No tee time cards found")
-
-        # Parse the input time range for comparison
-        logger.info(f"Debug - time_range_start: '{time_range_start}'")
-        logger.info(f"Debug - time_range_end: '{time_range_end}'")
-        
-        start_time_obj = datetime.strptime(time_range_start, '%H:%M').time()
-        # If end time is less than start time, assume it's PM
-        end_time_str = time_range_end
-        if datetime.strptime(end_time_str, '%H:%M').time() < start_time_obj:
-            end_time_str = f"{int(end_time_str.split(':')[0]) + 12}:{end_time_str.split(':')[1]}"
-        end_time_obj = datetime.strptime(end_time_str, '%H:%M').time()
-        target_players = int(players)
-
-        for card in tee_time_cards:
-            try:
-                # Extract time and player count
-                time_element = await card.query_selector('.times-booking-start-time-label')
-                time_text = await time_element.text_content() if time_element else "N/A"
-
-                players_element = await card.query_selector('.time-summary-ob-player-count')
-                players_text = await players_element.text_content() if players_element else "0 Players"
-
-                # Parse tee time
-                today = datetime.now().date()
-                time_str_lower = time_text.lower()
-                if 'am' in time_str_lower or 'pm' in time_str_lower:
-                    tee_time_dt_object = datetime.strptime(f'{today} {time_text}', '%Y-%m-%d %I:%M%p')
-                else:
-                    tee_time_dt_object = datetime.strptime(f'{today} {time_text}', '%Y-%m-%d %H:%M')
-                tee_time_time_obj = tee_time_dt_object.time()
-
-                # Parse available players
-                available_players = int(players_text.split(' Players')[0].strip())
-
-                # Check if this tee time matches our criteria
-                if tee_time_time_obj and start_time_obj <= tee_time_time_obj <= end_time_obj and available_players >= target_players:
-                    logger.info(f"Selecting tee time at {time_text} with {available_players} players")
-                    await card.click()
-                    await asyncio.sleep(6)
-                    await page.screenshot(path="teeTimeSelected.png")
-                    logger.info("tee time selected screenshot")
-                    return True
-
-            except Exception as e:
-                logger.warning(f"Error processing tee time card: {e}")
-                continue
-
-        raise Exception(f"No available tee times found between {time_range_start} and {time_range_end} for {players} players")
+        matches = await find_matching_tee_times(page, time_range_start, time_range_end, players)
+        if not matches:
+            if target_time:
+                raise SlotUnavailable(f"Target tee time {target_time} is no longer available")
+            raise Exception(f"No available tee times found between {time_range_start} and {time_range_end} for {players} players")
+
+        target = parse_tee_time_text(target_time) if target_time else None
+        if candidates is not None:
+            target = candidates.pick(attempt_id, [parse_tee_time_text(match[1]) for match in matches])
+        if target:
+            matches = [match for match in matches if parse_tee_time_text(match[1]) == target]
+            if not matches:
+                raise SlotUnavailable(f"Target tee time {target.strftime('%H:%M')} is no longer available")
+
+        card, time_text, available_players = matches[0]
+        logger.info(f"Selecting tee time at {time_text} with {available_players} players")
+        await card.click()
+        await asyncio.sleep(6)
+        await page.screenshot(path="teeTimeSelected.png")
+        logger.info("tee time selected screenshot")
+        return time_text
 
     except Exception as e:
         logger.error(f"Error selecting tee time: {e}")
@@ -180,23 +239,102 @@ async def handle_login_page(page, email, password):
         logger.error(f"Error during login handling: {e}")
         raise # Re-raise the exception
 
-async def select_booking_information(page, players):
+async def login_over_http(context, email, password, telemetry=None):
+    """
+    Logs in with a single HTTP request and injects the session cookies into the context.
+    Returns the session, or None if the HTTP login failed and the UI login should be used.
+    """
+    try:
+        session = await http_login(context.browser, email, password, os.getenv('BOOKING_CLASS_ID'), telemetry)
+        await inject_session(context, session)
+        return session
+    except Exception as e:
+        logger.warning(f"HTTP login failed, falling back to the login page: {e}")
+        return None
+
+async def submit_booking_directly(page, job, session, capture, timeouts=None, commit_guard=None, attempt_id=None, candidates=None, telemetry=None):
+    """
+    Books the first matching slot of the rendered tee sheet over HTTP with the login session.
+    Returns the confirmation, or None if the UI path should book instead. Only failures before
+    the reservation request is sent fall back to the UI; after that the booking may have gone
+    through, so ReservationUnconfirmed is raised instead.
+    """
+    if session is None:
+        logger.info("No HTTP session, booking through the UI")
+        return None
+
+    try:
+        await wait_for_tee_time_cards(page, timeouts)
+        await asyncio.wait_for(capture.captured.wait(), timeout=5)
+        start_time_obj, end_time_obj = parse_time_range(job.time_range_start, job.time_range_end)
+        slots = matching_slots(capture.slots, job.date, start_time_obj, end_time_obj, job.players)
+        if slots and candidates is not None:
+            target = candidates.pick(attempt_id, [slot_time(slot) for slot in slots])
+            slots = [slot for slot in slots if slot_time(slot) == target]
+        elif job.target_time:
+            slots = [slot for slot in slots if slot_time(slot) == parse_tee_time_text(job.target_time)]
+        if not slots:
+            logger.info("No matching slot in the captured tee sheet, booking through the UI")
+            return None
+
+        logger.info(f"Submitting booking for {slots[0]['time']} directly")
+        return await submit_booking(page.context.request, session, slots[0], job.players, job.holes, commit_guard, attempt_id, telemetry)
+
+    except (CommitLost, NoCandidate):
+        # Another attempt is booking, or this one has nothing to race for; the UI wouldn't do better
+        raise
+    except ReservationUnconfirmed:
+        # The reservation may exist; booking through the UI could book a second tee time
+        raise
+    except Exception as e:
+        logger.warning(f"Direct booking failed, falling back to the UI: {e}")
+        return None
+
+async def handle_login(page, email, password, session=None):
+    """
+    Returns the page to continue booking on. With a session from the HTTP login the booking
+    form should appear without the login form; if it doesn't (no session, or the session
+    was rejected), logs in through the login page.
+    """
+    if session is None:
+        return await handle_login_page(page, email, password)
+
+    logger.info("Checking the HTTP login session is accepted")
+    booking_page = page.context.pages[-1]
+    booking_form = booking_page.locator('label[for^="holes-"]')
+    login_form = booking_page.locator('input[type="text"][id="login_email"]')
+    await booking_form.or_(login_form).first.wait_for(timeout=15000)
+
+    if await login_form.count() > 0 and await login_form.first.is_visible():
+        logger.warning("Login form shown despite the HTTP session, falling back to the login page")
+        return await handle_login_page(page, email, password)
+
+    logger.info("HTTP login session accepted, skipping the login page.")
+    return booking_page
+
+async def select_booking_information(page, players, timeouts=None, holes="18"):
     """
     Selects the booking information on the post-login page (Holes, Players, Cart - assuming Cart=Yes).
     Clicks the 'Book Time' button to proceed.
     """
     logger.info("=== SELECTING BOOKING INFORMATION START ===")
+    timeouts = timeouts or FIXED_TIMEOUTS
 
     try:
-        # Select 18 Holes
-        holes_18_label_selector = 'label[for="holes-eighteen"]'
-        logger.info(f"Attempting to select 18 Holes using selector: {holes_18_label_selector}")
+        # Select Holes (18 unless the job asks for the 9-hole variant)
+        holes_map_member = HolesMap.from_number(holes)
+        if not holes_map_member:
+            logger.error(f"Invalid number of holes: {holes}. Cannot construct ID-based selector using Enum.")
+            raise ValueError(f"Invalid number of holes: {holes}")
+        holes_label_selector = f'label[for="holes-{holes_map_member.to_id_text()}"]'
+        logger.info(f"Attempting to select {holes} Holes using selector: {holes_label_selector}")
         try:
             # Use page.click which waits for the element to be visible and enabled
-            await page.click(holes_18_label_selector, timeout=15000) # Increased timeout
-            logger.info("Successfully selected 18 Holes.")
+            async with timeouts.step('select_booking_information.holes', 15000) as timeout_ms:
+                await page.click(holes_label_selector, timeout=timeout_ms)
+            logger.info(f"Successfully selected {holes} Holes.")
         except Exception as e:
-            logger.error(f"Could not select 18 Holes with selector {holes_18_label_selector}: {e}")
+            logger.error(f"Could not select {holes} Holes with selector {holes_label_selector}: {e}")
             raise # Re-raise the exception
 
         # Select Players
@@ -210,8 +348,9 @@ async def select_booking_information(page, players):
 
             try:
                 # Use page.wait_for_selector followed by click()
-                players_button = await page.wait_for_selector(players_label_selector, timeout=15000) # Increased timeout
-                await players_button.click()
+                async with timeouts.step('select_booking_information.players', 15000) as timeout_ms:
+                    players_button = await page.wait_for_selector(players_label_selector, timeout=timeout_ms)
+                    await players_button.click()
                 logger.info(f"Successfully selected Players for {players} players.")
 
             except Exception as click_error:
@@ -234,8 +373,9 @@ async def select_booking_information(page, players):
 
         try:
             # Use page.wait_for_selector followed by click()
-            book_time_button = await page.wait_for_selector(book_time_button_selector, timeout=15000) # Increased timeout
-            await book_time_button.click()
+            async with timeouts.step('select_booking_information.continue', 15000) as timeout_ms:
+                book_time_button = await page.wait_for_selector(book_time_button_selector, timeout=timeout_ms)
+                await book_time_button.click()
             logger.info("Successfully clicked the Book Time button.")
 
         except Exception as click_error:
@@ -248,47 +388,69 @@ async def select_booking_information(page, players):
 
     logger.info("=== SELECTING BOOKING INFORMATION END ===")
 
-async def finalize_booking(page):
+async def finalize_booking(page, timeouts=None, commit_guard=None, attempt_id=None):
     """
     Handles the final steps in the payment dialog: selecting Pay at Facility,
+    With a commit guard, the final Book Time button is only clicked once this attempt
+    claims the commit (CommitLost if another attempt has it); the claim is released if
+    anything fails before the click. If the final click itself fails,
+    ReservationUnconfirmed is raised: the booking may have gone through.
     """
     logger.info("=== FINALIZING BOOKING START ===")
+    timeouts = timeouts or FIXED_TIMEOUTS
 
     try:
         # Wait for the payment modal to be visible
         payment_modal_selector = 'div#select-payment-type-modal[style*="display: block"]'
         logger.info(f"Waiting for payment modal to be visible with selector: {payment_modal_selector}")
         # Using page.wait_for_selector directly on the main page object, as the modal is likely part of it.
-        await page.wait_for_selector(payment_modal_selector, state='visible', timeout=10000) # Increased timeout
+        await timeouts.wait('finalize_booking.payment_modal', lambda timeout_ms: page.wait_for_selector(payment_modal_selector, state='visible', timeout=timeout_ms), 10000)
         logger.info("Payment modal is visible.")
 
+        # First attempt to reach the payment dialog takes the booking, the others stop here
+        if commit_guard:
+            await commit_guard.claim(attempt_id)
+
         # Select Pay at Facility
         pay_at_facility_selector = 'input[type="radio"][value="facility"]'
-        logger.info(f"Attempting to click Pay at Facility radio button with selector: {pay_at_facility_selector}")
-
+        final_book_time_button_selector = 'div#select-payment-type-modal button.peg-btn-primary:has-text("Book Time")'
         try:
-            # Use page.click which waits for the element to be visible and enabled
-            await page.click(pay_at_facility_selector, timeout=15000) # Increased timeout
-            logger.info("Successfully clicked the Pay at Facility radio button.")
+            logger.info(f"Attempting to click Pay at Facility radio button with selector: {pay_at_facility_selector}")
+            try:
+                # Use page.click which waits for the element to be visible and enabled
+                async with timeouts.step('finalize_booking.pay_at_facility', 15000) as timeout_ms:
+                    await page.click(pay_at_facility_selector, timeout=timeout_ms)
+                logger.info("Successfully clicked the Pay at Facility radio button.")
 
-        except Exception as click_error:
-            logger.error(f"Could not click Pay at Facility radio button with selector {pay_at_facility_selector}: {click_error}")
-            raise # Re-raise the exception
+            except Exception as click_error:
+                logger.error(f"Could not click Pay at Facility radio button with selector {pay_at_facility_selector}: {click_error}")
+                raise # Re-raise the exception
+
+            logger.info(f"Waiting for the final Book Time button with selector: {final_book_time_button_selector}")
+            async with timeouts.step('finalize_booking.book_time', 15000) as timeout_ms:
+                final_book_time_button = await page.wait_for_selector(final_book_time_button_selector, timeout=timeout_ms)
+        except BaseException:
+            # Nothing was committed, so another attempt or job may book instead
+            if commit_guard:
+                commit_guard.release(attempt_id)
+            raise
 
         # Click the final Book Time confirmation button in the modal
-        final_book_time_button_selector = 'div#select-payment-type-modal button.peg-btn-primary:has-text("Book Time")'
         logger.info(f"Attempting to click the final Book Time button with selector: {final_book_time_button_selector}")
-
         try:
-
-            # Use page.wait_for_selector followed by click()
-            final_book_time_button = await page.wait_for_selector(final_book_time_button_selector, timeout=15000) # Increased timeout
-            await final_book_time_button.click()
+            try:
+                await final_book_time_button.click()
+            except Exception as e:
+                # The click may have reached the page, so the booking may exist
+                raise ReservationUnconfirmed(f"Final Book Time click failed, booking state unknown: {e}") from e
             logger.info("Successfully clicked the final Book Time button.")
 
-            # Optional: Take a screenshot after final booking click
-            await page.screenshot(path="bookingFinalized.png")
-            logger.info("Screenshot after finalizing booking saved.")
+            # Optional: Take a screenshot after final booking click. The booking is sent; this must not fail it
+            try:
+                await page.screenshot(path="bookingFinalized.png")
+                logger.info("Screenshot after finalizing booking saved.")
+            except Exception as e:
+                logger.warning(f"Could not save the screenshot after finalizing booking: {e}")
 
         except Exception as click_error:
             logger.error(f"Could not click final Book Time button with selector {final_book_time_button_selector}: {click_error}")
@@ -354,126 +516,320 @@ async def select_holes_filter(page, target_holes):
         logger.error(f"Error selecting holes filter: {e}")
         raise # Re-raise the exception
 
-async def book_tee_time():
+async def open_booking_page(page):
+    """
+    Opens the booking page, picks the public booking class and waits for the course list.
+    """
+    # Navigate to the booking page
+    logger.info("Navigating to booking page")
+    await page.goto(booking_page_url())
+
+    # Click Public Tee Times button
+    logger.info("Clicking Public Tee Times button")
+    await page.click(PUBLIC_TEE_TIMES_SELECTOR)
+
+    # Wait for the course list or main content to load after clicking Public Tee Times
+    await page.wait_for_selector('#js-course-list') # Wait for the sidebar course list
+    logger.info("Waited for course list to load.")
+
+async def toggle_course(page, schedule_id):
+    """
+    Toggles a course in the sidebar course list by its schedule ID.
+    """
+    logger.info(f"Toggling course with schedule ID {schedule_id}")
+    await page.locator(f'#js-course-list > div.filter-course-option[data-schedule-id="{schedule_id}"] > div.filter-course-select-button-bordered.js-filter-course-select-toggle').click()
+
+async def navigate_via_clicks(page, players, holes, schedule_ids):
+    """
+    Navigates to the filtered tee sheet the way a user would: booking class,
+    course toggles, then the player and holes filters.
+    """
+    await open_booking_page(page)
+
+    # Click Park Ridge (and Osprey, if requested) in the sidebar
+    for schedule_id in schedule_ids:
+        await toggle_course(page, schedule_id)
+
+    # Select player count filter
+    await select_players_filter(page, players)
+
+    # Select number of holes filter (defaulting to '18' as per requirement 7)
+    await select_holes_filter(page, holes)
+
+BROWSER_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--disable-features=IsolateOrigins,site-per-process',
+    '--disable-site-isolation-trials',
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-accelerated-2d-canvas',
+    '--no-first-run',
+    '--no-zygote',
+    '--disable-gpu'
+]
+
+async def launch_browser(p):
+    """
+    Launches Chromium with arguments to make headless mode appear more like a regular browser.
+    """
+    return await p.chromium.launch(headless=True, args=BROWSER_ARGS)
+
+async def new_booking_context(browser):
+    """
+    Opens a fresh browser context with a desktop viewport and user agent.
+    """
+    return await browser.new_context(
+        viewport={'width': 1920, 'height': 1080},
+        user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36'
+    )
+
+def build_tee_sheet_graph(page, job, entry_deps=()):
+    """
+    Builds the steps that land on the tee sheet for the job's day with the course, player
+    and holes filters applied. The course toggles and filters don't depend on each other,
+    so they run concurrently once the booking page is open. `entry_deps` are steps that
+    must finish before the first page load.
+    """
+    graph = StepGraph()
+    schedule_ids = job.course_schedule_ids()
+
+    if os.getenv('FAST_NAVIGATION', 'false').lower() == 'true':
+        # Land on the filtered tee sheet via the deep link, falling back to the click path
+        booking_class_id = os.getenv('BOOKING_CLASS_ID')
+        graph.add('navigate', lambda results: navigate_to_tee_sheet(page, job.date, job.players, job.holes, schedule_ids, navigate_via_clicks, booking_class_id), deps=entry_deps)
+        filter_steps = ['navigate']
+    else:
+        graph.add('open_booking_page', lambda results: open_booking_page(page), deps=entry_deps, retries=1)
+        filter_steps = []
+        for schedule_id in schedule_ids:
+            # Not retried: the click is a toggle, so a retry after a click that registered would deselect the course
+            graph.add(f'toggle_course_{schedule_id}', lambda results, schedule_id=schedule_id: toggle_course(page, schedule_id), deps=['open_booking_page'])
+            filter_steps.append(f'toggle_course_{schedule_id}')
+        graph.add('players_filter', lambda results: select_players_filter(page, job.players), deps=['open_booking_page'], retries=1)
+        graph.add('holes_filter', lambda results: select_holes_filter(page, job.holes), deps=['open_booking_page'], retries=1)
+        filter_steps += ['players_filter', 'holes_filter']
+
+    async def select_day_step(results):
+        # Filter by date, unless the fast path already applied it
+        if results.get('navigate'):
+            return
+        await select_day(page, job.date)
+
+    graph.add('select_day', select_day_step, deps=filter_steps, retries=1)
+    return graph
+
+def build_booking_graph(page, job, timeouts, commit_guard=None, attempt_id=None, candidates=None, telemetry=None):
+    """
+    Builds the full booking flow: the tee sheet steps, then selecting the tee time,
+    logging in, the booking information and the payment dialog. `telemetry` records
+    the direct API requests, which the context's request events don't show.
+    """
+    use_http_login = http_login_enabled()
+
+    # The session cookies have to be in the context before the tee sheet loads
+    graph = build_tee_sheet_graph(page, job, ['http_login'] if use_http_login else [])
+    if use_http_login:
+        graph.add('http_login', lambda results: login_over_http(page.context, job.email, job.password, telemetry))
+    ui_deps = ['select_day']
+    if use_http_login and direct_booking_enabled():
+        # Book over HTTP first; the UI steps below only run if that didn't confirm a reservation.
+        # Not budgeted: a cut-off reservation request must surface as ReservationUnconfirmed
+        capture = TeeSheetCapture(job.date)
+        capture.attach(page)
+        graph.add('submit_booking', lambda results: submit_booking_directly(page, job, results['http_login'], capture, timeouts, commit_guard, attempt_id, candidates, telemetry), deps=['select_day', 'http_login'], budgeted=False)
+        ui_deps = ['submit_booking']
+
+    def unless_booked(action):
+        async def step(results):
+            if results.get('submit_booking'):
+                return None
+            return await action(results)
+        return step
+
+    # Not budgeted as a whole: its card wait has its own budget and retry, which a step budget would cut short
+    graph.add('select_tee_time', unless_booked(lambda results: select_tee_time(page, job.time_range_start, job.time_range_end, job.players, timeouts, job.target_time, candidates, attempt_id)), deps=ui_deps, budgeted=False)
+    graph.add('handle_login_page', unless_booked(lambda results: handle_login(page, job.email, job.password, results.get('http_login'))), deps=['select_tee_time'], retries=1)
+    graph.add('select_booking_information', unless_booked(lambda results: select_booking_information(results['handle_login_page'], job.players, timeouts, job.holes)), deps=['handle_login_page'], retries=1)
+    # Not retried: a second attempt can't tell whether the first already booked. Not budgeted
+    # either: cancelling it after the final click would hide that the booking may exist
+    graph.add('finalize_booking', unless_booked(lambda results: finalize_booking(results['handle_login_page'], timeouts, commit_guard, attempt_id)), deps=['select_booking_information'], budgeted=False)
+    return graph
+
+_run_numbers = itertools.count(1)
+
+def run_label(job, attempt_id=None):
+    """
+    Names a booking run for its output files. Runs can happen concurrently (sharded workers,
+    race attempts, the scheduler, the load test), so the label carries the account, the date,
+    the process and a per-process run number, plus the race attempt if there is one.
+    """
+    account = re.sub(r'[^A-Za-z0-9]+', '_', job.email.split('@')[0])
+    label = f'{account}-{job.date}-{os.getpid()}-{next(_run_numbers)}'
+    if attempt_id is not None:
+        label += f'-attempt{attempt_id}'
+    return label
+
+def run_output_path(path, label):
+    """
+    Puts the run label into an output file name: trace.zip becomes trace-<label>.zip.
+    """
+    root, ext = os.path.splitext(path)
+    return f'{root}-{label}{ext}'
+
+async def run_booking(browser, job, commit_guard=None, attempt_id=None, candidates=None):
+    """
+    Books a tee time for the job in a fresh context of an already launched browser.
+    Returns a summary of the booked slot.
+    When it races other attempts through a commit guard, holds it made are released
+    if it doesn't end up booking (it lost, failed or was cancelled).
+    """
+    timeouts = TimeoutManager.from_env()
+    label = run_label(job, attempt_id)
+    context = await new_booking_context(browser)
+    holds = HoldTracker() if commit_guard else None
+    if holds:
+        holds.attach(context)
+    booked = False
+    tracing = tracing_enabled()
+    if tracing:
+        await start_tracing(context)
+    telemetry = NetworkTelemetry() if telemetry_enabled() else None
+    if telemetry:
+        telemetry.attach(context)
+    page = await context.new_page()
+
+    # Create an instance of the Inspector class
+    inspector = Inspector(page)
+    print(f"Created inspector object: {inspector}")
+
+    try:
+        run = await run_graph(build_booking_graph(page, job, timeouts, commit_guard, attempt_id, candidates, telemetry), timeouts, listeners=[telemetry] if telemetry else ())
+        booked = True
+        direct_booking = run.results.get('submit_booking')
+        if direct_booking:
+            return {'date': job.date, 'time': direct_booking['time'], 'players': job.players, 'email': job.email,
+                    'reservation_id': direct_booking['reservation_id'], 'timings': run.timings}
+        return {'date': job.date, 'time': run.results['select_tee_time'], 'players': job.players, 'email': job.email,
+                'timings': run.timings}
+
+    except StepError as e:
+        if isinstance(e.error, PlaywrightTimeoutError):
+            logger.error(f"Timeout error in step '{e.step}': {str(e.error)}")
+        else:
+            logger.error(f"Error during booking process in step '{e.step}': {str(e.error)}")
+        raise
+    except Exception as e:
+        logger.error(f"Error during booking process: {str(e)}")
+        raise
+    finally:
+        if holds and not booked:
+            await holds.release_all(context.request, telemetry)
+        timeouts.save()
+        if telemetry:
+            await telemetry.write(run_output_path(os.getenv('NETWORK_TELEMETRY_PATH', DEFAULT_TELEMETRY_PATH), label))
+        if tracing:
+            await stop_tracing(context, run_output_path('trace.zip', label), run_output_path('trace_report.json', label))
+        await context.close()
+
+async def run_search(browser, job):
+    """
+    Lists the tee times matching the job without booking anything.
+    """
+    context = await new_booking_context(browser)
+    page = await context.new_page()
+
+    async def find_tee_times(results):
+        await wait_for_tee_time_cards(page)
+        return await find_matching_tee_times(page, job.time_range_start, job.time_range_end, job.players)
+
+    try:
+        graph = build_tee_sheet_graph(page, job)
+        graph.add('find_tee_times', find_tee_times, deps=['select_day'])
+        run = await run_graph(graph)
+        matches = run.results['find_tee_times']
+        logger.info(f"Found {len(matches)} matching tee times for {job.describe()}")
+        return [{'date': job.date, 'time': time_text, 'available_players': available_players}
+                for _, time_text, available_players in matches]
+    finally:
+        await context.close()
+
+async def race_booking(browser, job, count, commit_guard=None):
+    """
+    Tries the top `count` matching tee times at once, each in its own context with the same
+    account. All attempts load the tee sheet in parallel and split the matches of the first
+    sheet that renders between them. The first attempt to reach the payment dialog claims
+    the commit guard (and `commit_guard`, if given) and books; the others are cancelled and
+    release their holds.
+    """
+    logger.info(f"Racing up to {count} tee times")
+    guard = CommitGuard(parent=commit_guard)
+    candidates = RaceCandidates(count)
+    attempts = [asyncio.create_task(run_booking(browser, job, guard, attempt_id, candidates))
+                for attempt_id in range(count)]
+    committed = asyncio.ensure_future(guard.committed.wait())
+    try:
+        pending = set(attempts)
+        while pending and not committed.done():
+            _, pending = await asyncio.wait(pending | {committed}, return_when=asyncio.FIRST_COMPLETED)
+            pending.discard(committed)
+
+        if guard.winner is None:
+            # Every attempt failed before reaching the payment dialog
+            logger.error("No racing attempt reached the payment dialog")
+            await attempts[0]
+
+        winner = attempts[guard.winner]
+        losers = [attempt for attempt in attempts if attempt is not winner]
+        for attempt in losers:
+            attempt.cancel()
+        # The cancelled attempts release their holds and close their contexts while the winner books
+        await asyncio.gather(*losers, return_exceptions=True)
+        return await winner
+
+    finally:
+        committed.cancel()
+        for attempt in attempts:
+            attempt.cancel()
+
+async def book(browser, job, commit_guard=None):
+    """
+    Books the job, racing the top candidates if RACE_CANDIDATES is above 1. With a commit
+    guard, the booking is only committed if the guard allows it.
+    """
+    count = race_candidates()
+    if count > 1:
+        return await race_booking(browser, job, count, commit_guard)
+    return await run_booking(browser, job, commit_guard)
+
+async def run_job(browser, job, commit_guard=None):
+    """
+    Runs a booking or search job on an already launched browser.
+    """
+    if job.kind == 'search':
+        return await run_search(browser, job)
+    return await book(browser, job, commit_guard)
+
+async def book_tee_time(job=None, browser=None):
     """
     Main function to book a tee time using Playwright automation.
+    Uses the environment-configured job unless one is given, and launches its own
+    browser unless one is passed in.
     """
     try:
-        # Get environment variables
-        time_range_start = os.getenv('TIME_RANGE_START')
-        time_range_end = os.getenv('TIME_RANGE_END')
-        players = os.getenv('PLAYERS')
-        email = os.getenv('EMAIL')
-        password = os.getenv('PASSWORD')
-        osprey_only = os.getenv('OSPREY_ONLY')
-        
-        # Calculate date 7 days from today
-        from datetime import datetime, timedelta
-        target_date = datetime.now() + timedelta(days=1)
-        date = target_date.strftime('%Y-%m-%d')
-        logger.info(f"Calculated target date: {date} (7 days from today)")
-
-        # Clean up players value - remove quotes, comments, and extra whitespace
-        if players:
-            players = players.split('#')[0].strip().replace('"', '')
-            logger.info(f"Cleaned players value: '{players}'")
-
-        logger.info(f"Attempting to book tee time for {date} between {time_range_start} and {time_range_end} for {players} player(s). Osprey only: {osprey_only}")
-
-        # Validate required environment variables
-        required_vars = {
-            'TIME_RANGE_START': time_range_start,
-            'TIME_RANGE_END': time_range_end,
-            'PLAYERS': players,
-            'EMAIL': email,
-            'PASSWORD': password,
-            'OSPREY_ONLY': osprey_only
-        }
-
-        missing_vars = [var for var, value in required_vars.items() if not value]
-        if missing_vars:
-            raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
+        if job is None:
+            job = BookingJob.from_env()
 
+        logger.info(f"Attempting to book tee time for {job.date} between {job.time_range_start} and {job.time_range_end} for {job.players} player(s). Osprey only: {job.osprey_only}")
         logger.info("Starting tee time booking process")
-        
-        async with async_playwright() as p:
-            # Launch browser with arguments to make headless mode appear more like a regular browser
-            browser = await p.chromium.launch(
-                headless=True,
-                args=[
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-features=IsolateOrigins,site-per-process',
-                    '--disable-site-isolation-trials',
-                    '--no-sandbox',
-                    '--disable-setuid-sandbox',
-                    '--disable-dev-shm-usage',
-                    '--disable-accelerated-2d-canvas',
-                    '--no-first-run',
-                    '--no-zygote',
-                    '--disable-gpu'
-                ]
-            )
-            context = await browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36'
-            )
-            page = await context.new_page()
-
-            # Create an instance of the Inspector class
-            inspector = Inspector(page)
-            print(f"Created inspector object: {inspector}")
 
+        if browser is not None:
+            return await book(browser, job)
+
+        async with async_playwright() as p:
+            browser = await launch_browser(p)
             try:
-                # Navigate to the booking page
-                logger.info("Navigating to booking page")
-                await page.goto('https://foreupsoftware.com/index.php/booking/a/21263/21#/teetimes')
-                
-                # Click Public Tee Times button
-                logger.info("Clicking Public Tee Times button")
-                await page.click('div.booking-classes >> button:has-text("Public Tee Times")')
-                
-                # Wait for the course list or main content to load after clicking Public Tee Times
-                await page.wait_for_selector('#js-course-list') # Wait for the sidebar course list
-                logger.info("Waited for course list to load.")
-
-                # Click Park Ridge in the sidebar
-                logger.info("Selecting Park Ridge course")
-                await page.locator('#js-course-list > div.filter-course-option[data-schedule-id="7483"] > div.filter-course-select-button-bordered.js-filter-course-select-toggle').click()
-
-                # If osprey only, filter by osprey
-                osprey_only_str = os.getenv('OSPREY_ONLY', 'false')
-                osprey_only = osprey_only_str.lower() == 'true'
-                if osprey_only:
-                    logger.info("Filtering by Osprey only")
-                    await page.locator('#js-course-list > div.filter-course-option[data-schedule-id="7480"] > div.filter-course-select-button-bordered.js-filter-course-select-toggle').click()
-
-                # Select player count filter
-                await select_players_filter(page, players)
-
-                # Select number of holes filter (defaulting to '18' as per requirement 7)
-                await select_holes_filter(page, "18")
-
-                # Filter by date
-                await select_day(page, date)
-
-                # # Then select a matching tee time
-                await select_tee_time(page, time_range_start, time_range_end, players)
-                                    
-                # Handle the login and get the post-login page
-                post_login_page = await handle_login_page(page, email, password)
-
-                # Select booking information
-                await select_booking_information(post_login_page, players)
-
-                # Finalize the booking
-                await finalize_booking(post_login_page)
-
-            except PlaywrightTimeoutError as e:
-                logger.error(f"Timeout error: {str(e)}")
-                raise
-            except Exception as e:
-                logger.error(f"Error during booking process: {str(e)}")
-                raise
+                return await book(browser, job)
             finally:
                 await browser.close()
 
@@ -485,4 +841,4 @@ def lambda_handler(event, context):
     asyncio.run(book_tee_time())
 
 if __name__ == "__main__":
-    asyncio.run(book_tee_time())
\ No newline at end of file
+    asyncio.run(book_tee_time())
@@ -0,0 +1,146 @@
+import os
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# How often a job waiting on another job's group claim checks whether it was released
+CLAIM_POLL_INTERVAL = 0.2
+
+
+def race_candidates():
+    """
+    How many of the top matching tee times to try at once (RACE_CANDIDATES, default 1: no racing).
+    """
+    return max(1, int(os.getenv('RACE_CANDIDATES', '1')))
+
+
+class CommitLost(Exception):
+    """
+    Raised in an attempt that reached the commit point after another attempt already claimed it.
+    """
+
+
+class NoCandidate(Exception):
+    """
+    Raised in an attempt that has no tee time of its own to race for.
+    """
+
+
+class RaceCandidates:
+    """
+    Splits the top matching tee times between racing attempts. The list comes from the first
+    tee sheet any attempt renders, so the attempts agree on it without loading a sheet up front.
+    """
+
+    def __init__(self, count):
+        self.count = count
+        self.times = None
+
+    def pick(self, attempt_id, times):
+        """
+        Returns the tee time (a datetime.time) for the attempt, given the matching times of its
+        own sheet in page order. Raises NoCandidate if fewer distinct tee times matched than there
+        are attempts.
+        """
+        if self.times is None:
+            # With two courses a time can appear twice; each attempt gets a distinct time, as
+            # attempts select by time and two at the same time would race for one card
+            self.times = list(dict.fromkeys(times))[:self.count]
+            logger.info(f"Racing {len(self.times)} tee times: {', '.join(t.strftime('%H:%M') for t in self.times)}")
+        if attempt_id >= len(self.times):
+            raise NoCandidate(f"No tee time left for attempt {attempt_id}: only {len(self.times)} matched")
+        return self.times[attempt_id]
+
+
+class CommitGuard:
+    """
+    Lets exactly one of several concurrent booking attempts commit (click the final "Book Time"
+    button or confirm over HTTP). The first attempt to claim wins; every later claim raises
+    CommitLost. Attempts run on one event loop, so a plain flag is enough.
+    With a `parent` guard, the winner also has to claim the parent's commit, so races nest
+    inside a wider claim such as a booking group shared across processes.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.winner = None
+        self.committed = asyncio.Event()
+
+    async def claim(self, attempt_id):
+        """
+        Claims the commit for the attempt or raises CommitLost.
+        """
+        if self.winner is not None:
+            logger.info(f"Attempt {attempt_id} lost the commit to attempt {self.winner}")
+            raise CommitLost(f"Attempt {attempt_id} was beaten to the commit by attempt {self.winner}")
+        # Taken before waiting on the parent, so no sibling claims in the meantime
+        self.winner = attempt_id
+        try:
+            if self.parent:
+                await self.parent.claim(attempt_id)
+        except BaseException:
+            self.winner = None
+            raise
+        self.committed.set()
+        logger.info(f"Attempt {attempt_id} claimed the commit")
+
+    def release(self, attempt_id):
+        """
+        Gives the commit back after the attempt failed before sending its commit action.
+        """
+        if self.winner != attempt_id:
+            return
+        self.winner = None
+        self.committed.clear()
+        if self.parent:
+            self.parent.release(attempt_id)
+        logger.info(f"Attempt {attempt_id} released the commit")
+
+
+class GroupCommitGuard(CommitGuard):
+    """
+    Lets exactly one job of a booking group commit at a time, across worker processes. `claims`
+    and `lock` are a Manager dict and lock shared by the workers. A job that finds the group
+    claimed by another job waits at its commit point: if the claimant fails before committing
+    it releases the claim and the waiting job takes over; if the claimant books, the runner
+    cancels the waiting job.
+    """
+
+    def __init__(self, group, job_index, claims, lock, poll_interval=CLAIM_POLL_INTERVAL):
+        super().__init__()
+        self.group = group
+        self.job_index = job_index
+        self.claims = claims
+        self.lock = lock
+        self.poll_interval = poll_interval
+
+    def _try_claim(self):
+        with self.lock:
+            owner = self.claims.get(self.group)
+            if owner is None:
+                self.claims[self.group] = self.job_index
+                owner = self.job_index
+        return owner
+
+    async def claim(self, attempt_id):
+        waiting_on = None
+        while True:
+            owner = self._try_claim()
+            if owner == self.job_index:
+                break
+            if owner != waiting_on:
+                logger.info(f"Job {self.job_index} waiting: job {owner} is committing group '{self.group}'")
+                waiting_on = owner
+            await asyncio.sleep(self.poll_interval)
+        self.winner = self.job_index
+        self.committed.set()
+        logger.info(f"Job {self.job_index} claimed group '{self.group}'")
+
+    def release(self, attempt_id):
+        with self.lock:
+            if self.claims.get(self.group) == self.job_index:
+                del self.claims[self.group]
+        self.winner = None
+        self.committed.clear()
+        logger.info(f"Job {self.job_index} released group '{self.group}'")
@@ -32,4 +32,29 @@ class PlayerCountMap(Enum):
         """
         Returns the text representation used in the element ID (e.g., "two").
         """
-        return self.value 
\ No newline at end of file
+        return self.value 
+
+# Define an Enum for mapping the number of holes to text used in element IDs
+class HolesMap(Enum):
+    NINE = "nine"
+    EIGHTEEN = "eighteen"
+
+    @classmethod
+    def from_number(cls, number):
+        """
+        Converts a number of holes (string or int) to the corresponding Enum member.
+        Returns None if no match.
+        """
+        num_str = str(number).strip()
+        if num_str == "9":
+            return cls.NINE
+        elif num_str == "18":
+            return cls.EIGHTEEN
+        else:
+            return None
+
+    def to_id_text(self):
+        """
+        Returns the text representation used in the element ID (e.g., "eighteen").
+        """
+        return self.value
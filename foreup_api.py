@@ -0,0 +1,342 @@
+import os
+import asyncio
+import logging
+from datetime import datetime
+from navigator import booking_base_url, COURSE_ID
+
+logger = logging.getLogger(__name__)
+
+LOGIN_PATH = '/index.php/api/booking/users/login'
+TIMES_PATH = '/index.php/api/booking/times'
+PENDING_RESERVATION_PATH = '/index.php/api/booking/pending_reservation'
+RESERVATIONS_PATH = '/index.php/api/booking/users/reservations'
+
+# The public booking site sends these with every API call
+API_HEADERS = {
+    'api-key': 'no_limits',
+    'x-fu-golfer-location': 'foreup',
+    'x-requested-with': 'XMLHttpRequest',
+}
+
+
+class LoginError(Exception):
+    """
+    Raised when the HTTP login doesn't yield a usable session.
+    """
+
+
+class BookingError(Exception):
+    """
+    Raised when the direct booking submission doesn't end in a confirmed reservation.
+    """
+
+
+class ReservationUnconfirmed(BookingError):
+    """
+    Raised when the reservation request was sent but its outcome couldn't be confirmed.
+    The server may have booked, so the caller must not book again.
+    """
+
+
+class ForeUpSession:
+    """
+    An authenticated ForeUp session: the session cookies and the JWT the booking API expects.
+    """
+
+    def __init__(self, cookies, jwt=None, user=None):
+        self.cookies = cookies
+        self.jwt = jwt
+        self.user = user or {}
+
+    def auth_headers(self):
+        headers = dict(API_HEADERS)
+        if self.jwt:
+            headers['x-authorization'] = f'Bearer {self.jwt}'
+        return headers
+
+
+def http_login_enabled():
+    """
+    The HTTP login is opt-in via HTTP_LOGIN=true.
+    """
+    return os.getenv('HTTP_LOGIN', 'false').lower() == 'true'
+
+
+async def _send(telemetry, method, url, call):
+    """
+    Sends an API request with `call()`, recording it in the network telemetry if one is given:
+    APIRequestContext requests don't fire the context's request events the telemetry listens to.
+    """
+    if telemetry is None:
+        return await call()
+    return await telemetry.track(method, url, call)
+
+
+async def http_login(browser, email, password, booking_class_id=None, telemetry=None):
+    """
+    Performs the login request directly from a throwaway browser context (no page is
+    rendered) and returns the resulting ForeUpSession. Raises LoginError if the
+    response doesn't look like a logged-in session.
+    """
+    logger.info("=== HTTP LOGIN START ===")
+    login_context = await browser.new_context()
+    try:
+        url = f'{booking_base_url()}{LOGIN_PATH}'
+        response = await _send(telemetry, 'POST', url, lambda: login_context.request.post(
+            url,
+            headers=API_HEADERS,
+            form={
+                'username': email,
+                'password': password,
+                'booking_class_id': booking_class_id or '',
+                'api_key': 'no_limits',
+                'course_id': COURSE_ID,
+            },
+        ))
+        logger.info(f"Login request returned HTTP {response.status}")
+        if not response.ok:
+            raise LoginError(f"Login request failed with HTTP {response.status}")
+
+        try:
+            data = await response.json()
+        except Exception:
+            raise LoginError("Login response was not JSON")
+        if not isinstance(data, dict) or not (data.get('jwt') or data.get('logged_in')):
+            raise LoginError("Login response did not contain a session")
+
+        cookies = await login_context.cookies()
+        if not cookies:
+            raise LoginError("Login response did not set any cookies")
+
+        logger.info(f"HTTP login succeeded with {len(cookies)} session cookie(s)")
+        return ForeUpSession(cookies, jwt=data.get('jwt'), user=data)
+
+    finally:
+        await login_context.close()
+        logger.info("=== HTTP LOGIN END ===")
+
+
+async def inject_session(context, session):
+    """
+    Copies the session cookies into the booking context so the tee sheet loads logged in.
+    """
+    await context.add_cookies(session.cookies)
+    logger.info(f"Injected {len(session.cookies)} session cookie(s) into the browser context")
+
+
+def direct_booking_enabled():
+    """
+    Direct booking submission is opt-in via DIRECT_BOOKING=true. It needs the HTTP login session.
+    """
+    return os.getenv('DIRECT_BOOKING', 'false').lower() == 'true'
+
+
+class TeeSheetCapture:
+    """
+    Keeps the latest slot list the tee sheet fetched from the times API for `date_str`
+    (YYYY-MM-DD), so a slot can be booked directly with the same data the page rendered its
+    cards from. Responses for other days (the default-date sheet the booking page loads first,
+    or late replies to earlier filter clicks) are ignored.
+    """
+
+    def __init__(self, date_str):
+        self.date_str = date_str
+        self.slots = []
+        self.captured = asyncio.Event()
+
+    def attach(self, page):
+        page.on('response', self._on_response)
+
+    async def _on_response(self, response):
+        if TIMES_PATH not in response.url or not response.ok:
+            return
+        try:
+            data = await response.json()
+        except Exception:
+            return
+        if not isinstance(data, list) or not data:
+            return
+        if not all(isinstance(slot, dict) and str(slot.get('time', '')).startswith(self.date_str) for slot in data):
+            logger.info(f"Ignoring a times response that isn't for {self.date_str}")
+            return
+        self.slots = data
+        self.captured.set()
+        logger.info(f"Captured {len(data)} slots for {self.date_str} from the tee sheet")
+
+
+def slot_time(slot):
+    """
+    Returns the time of day of a times API slot ('YYYY-MM-DD HH:MM').
+    """
+    return datetime.strptime(slot['time'], '%Y-%m-%d %H:%M').time()
+
+
+def matching_slots(slots, date_str, start_time_obj, end_time_obj, players):
+    """
+    Returns the slots on `date_str` (YYYY-MM-DD) inside the time window with room for the party,
+    earliest first.
+    """
+    target_players = int(players)
+    matches = [slot for slot in slots
+               if str(slot.get('time', '')).startswith(date_str)
+               and start_time_obj <= slot_time(slot) <= end_time_obj
+               and int(slot.get('available_spots') or 0) >= target_players]
+    return sorted(matches, key=slot_time)
+
+
+def parse_confirmation(data):
+    """
+    Pulls the reservation ID out of a reservation response. Raises BookingError if there is none.
+    """
+    if not isinstance(data, dict):
+        raise BookingError(f"Unexpected reservation response: {data!r}")
+    if data.get('success') is False or data.get('error'):
+        raise BookingError(f"Reservation rejected: {data.get('error') or data.get('msg')}")
+    reservation_id = data.get('TTID') or data.get('teetime_id') or data.get('reservation_id')
+    if not reservation_id:
+        raise BookingError("Reservation response has no reservation ID")
+    return reservation_id
+
+
+async def release_hold(request_context, reservation_id, headers=API_HEADERS, telemetry=None):
+    """
+    Releases a pending reservation so the slot goes back on the tee sheet straight away
+    instead of when the hold expires. Failures are only logged.
+    """
+    url = f'{booking_base_url()}{PENDING_RESERVATION_PATH}/{reservation_id}'
+    try:
+        response = await _send(telemetry, 'DELETE', url, lambda: request_context.delete(url, headers=headers))
+        logger.info(f"Releasing hold {reservation_id} returned HTTP {response.status}")
+    except Exception as e:
+        logger.warning(f"Could not release hold {reservation_id}: {e}")
+
+
+class HoldTracker:
+    """
+    Records the pending reservations (slot holds) the booking page makes, so an attempt
+    that is abandoned can release them.
+    """
+
+    def __init__(self):
+        self.reservation_ids = []
+
+    def attach(self, context):
+        context.on('response', self._on_response)
+
+    async def _on_response(self, response):
+        if PENDING_RESERVATION_PATH not in response.url or response.request.method != 'POST' or not response.ok:
+            return
+        try:
+            data = await response.json()
+        except Exception:
+            return
+        if isinstance(data, dict) and data.get('reservation_id'):
+            self.reservation_ids.append(data['reservation_id'])
+            logger.info(f"Page holds pending reservation {data['reservation_id']}")
+
+    async def release_all(self, request_context, telemetry=None):
+        # The request context shares the page's cookies, so the page's session authorizes it
+        for reservation_id in self.reservation_ids:
+            await release_hold(request_context, reservation_id, telemetry=telemetry)
+        self.reservation_ids = []
+
+
+async def _hold_slot(request_context, headers, slot, players, holes, telemetry=None):
+    """
+    Holds the slot as a pending reservation, as picking the tee time card does in the UI.
+    Returns the pending reservation ID.
+    """
+    url = f'{booking_base_url()}{PENDING_RESERVATION_PATH}'
+    pending = await _send(telemetry, 'POST', url, lambda: request_context.post(
+        url,
+        headers=headers,
+        form={
+            'time': slot['time'],
+            'holes': str(holes),
+            'players': str(players),
+            'carts': 'false',
+            'schedule_id': str(slot.get('schedule_id', '')),
+            'teesheet_side_id': str(slot.get('teesheet_side_id', '')),
+            'course_id': COURSE_ID,
+            'booking_class_id': str(slot.get('booking_class_id', '')),
+            'duration': '1',
+            'foreup_discount': 'false',
+        },
+    ))
+    logger.info(f"Pending reservation request returned HTTP {pending.status}")
+    if not pending.ok:
+        raise BookingError(f"Could not hold the slot: HTTP {pending.status}")
+    pending_data = await pending.json()
+    pending_id = pending_data.get('reservation_id') if isinstance(pending_data, dict) else None
+    if not pending_id:
+        raise BookingError(f"Slot hold was not granted: {pending_data!r}")
+    return pending_id
+
+
+async def _release_granted_hold(request_context, hold, headers, telemetry=None):
+    """
+    Waits for the hold request to finish and releases the hold if one was granted.
+    """
+    try:
+        pending_id = await hold
+    except BaseException:
+        # No hold was granted
+        return
+    await release_hold(request_context, pending_id, headers, telemetry)
+
+
+async def submit_booking(request_context, session, slot, players, holes, commit_guard=None, attempt_id=None, telemetry=None):
+    """
+    Books the slot with the authenticated session: holds it as a pending reservation,
+    then confirms it with pay-at-facility. Returns the confirmation as a dict.
+    With a commit guard, the hold is only confirmed if this attempt claims the commit.
+    The hold is released whenever the booking isn't confirmed, including when the attempt
+    is cancelled while the hold request is in flight. Raises ReservationUnconfirmed if the
+    reservation request went out but its outcome is unknown.
+    """
+    logger.info("=== DIRECT BOOKING SUBMISSION START ===")
+    headers = session.auth_headers()
+    # The hold request runs as its own task, so a cancelled attempt still learns the ID of a
+    # hold granted mid-request and can release it
+    hold = asyncio.ensure_future(_hold_slot(request_context, headers, slot, players, holes, telemetry))
+    confirmed = False
+    try:
+        pending_id = await asyncio.shield(hold)
+
+        if commit_guard:
+            await commit_guard.claim(attempt_id)
+
+        # Confirm it, as the booking form and the payment dialog do in the UI.
+        # Once this request is out the server may have booked, so no failure after it is retryable.
+        try:
+            url = f'{booking_base_url()}{RESERVATIONS_PATH}'
+            reservation = await _send(telemetry, 'POST', url, lambda: request_context.post(
+                url,
+                headers=headers,
+                data={
+                    **slot,
+                    'pending_reservation_id': pending_id,
+                    'holes': int(holes),
+                    'players': int(players),
+                    'carts': False,
+                    'payment_type': 'facility',
+                    'course_id': COURSE_ID,
+                },
+            ))
+            logger.info(f"Reservation request returned HTTP {reservation.status}")
+            if not reservation.ok:
+                raise BookingError(f"Reservation failed: HTTP {reservation.status}")
+            reservation_id = parse_confirmation(await reservation.json())
+        except Exception as e:
+            raise ReservationUnconfirmed(f"Reservation request for {slot['time']} was sent but not confirmed: {e}") from e
+
+        confirmed = True
+        logger.info(f"Reservation confirmed: {reservation_id}")
+        return {'reservation_id': reservation_id, 'time': slot['time']}
+
+    finally:
+        # Don't leave our own hold on the slot for the UI path (or anyone else) to run into.
+        # Shielded so that cancelling the attempt doesn't cut the release short.
+        if not confirmed:
+            await asyncio.shield(_release_granted_hold(request_context, hold, headers, telemetry))
+        logger.info("=== DIRECT BOOKING SUBMISSION END ===")
@@ -0,0 +1,134 @@
+import os
+import json
+import logging
+from dataclasses import dataclass, asdict, fields
+from datetime import datetime, timedelta
+from typing import List, Optional
+from navigator import schedule_ids_for
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BookingJob:
+    """
+    Everything one booking (or availability search) needs: the account, the day,
+    the time window and the party.
+    """
+    email: str
+    password: str
+    date: str
+    time_range_start: str
+    time_range_end: str
+    players: str
+    holes: str = '18'
+    osprey_only: bool = False
+    kind: str = 'book'  # 'book' or 'search'
+    group: Optional[str] = None  # Jobs in the same group compete for one slot; the first booking cancels the rest
+    schedule_ids: Optional[List[str]] = None  # Courses to toggle; defaults to Park Ridge (+ Osprey if osprey_only)
+    priority: int = 0  # Higher priority jobs get first pick when slots are assigned across accounts
+    target_time: Optional[str] = None  # Book this exact tee time (card label, e.g. '7:30am') instead of the first match
+
+    @classmethod
+    def from_env(cls):
+        """
+        Builds the job from the environment variables, as the bot has always been configured.
+        """
+        time_range_start = os.getenv('TIME_RANGE_START')
+        time_range_end = os.getenv('TIME_RANGE_END')
+        players = os.getenv('PLAYERS')
+        email = os.getenv('EMAIL')
+        password = os.getenv('PASSWORD')
+        osprey_only = os.getenv('OSPREY_ONLY')
+
+        # Calculate date 7 days from today
+        target_date = datetime.now() + timedelta(days=1)
+        date = target_date.strftime('%Y-%m-%d')
+        logger.info(f"Calculated target date: {date} (7 days from today)")
+
+        # Clean up players value - remove quotes, comments, and extra whitespace
+        if players:
+            players = players.split('#')[0].strip().replace('"', '')
+            logger.info(f"Cleaned players value: '{players}'")
+
+        # Validate required environment variables
+        required_vars = {
+            'TIME_RANGE_START': time_range_start,
+            'TIME_RANGE_END': time_range_end,
+            'PLAYERS': players,
+            'EMAIL': email,
+            'PASSWORD': password,
+            'OSPREY_ONLY': osprey_only
+        }
+
+        missing_vars = [var for var, value in required_vars.items() if not value]
+        if missing_vars:
+            raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
+
+        return cls(
+            email=email,
+            password=password,
+            date=date,
+            time_range_start=time_range_start,
+            time_range_end=time_range_end,
+            players=players,
+            osprey_only=osprey_only.lower() == 'true',
+        )
+
+    @classmethod
+    def from_dict(cls, data, defaults=None):
+        """
+        Builds a job from a dict, filling missing fields from `defaults` (another BookingJob).
+        """
+        values = asdict(defaults) if defaults else {}
+        known_fields = {field.name for field in fields(cls)}
+        unknown = set(data) - known_fields
+        if unknown:
+            raise ValueError(f"Unknown booking job fields: {', '.join(sorted(unknown))}")
+        values.update(data)
+        players = values.get('players')
+        if players is None or not str(players).strip():
+            raise ValueError("Incomplete booking job: missing players")
+        values['players'] = str(players).strip()
+        if isinstance(values.get('osprey_only'), str):
+            values['osprey_only'] = values['osprey_only'].lower() == 'true'
+        if values.get('kind', 'book') not in ('book', 'search'):
+            raise ValueError(f"Invalid job kind: {values.get('kind')}")
+        try:
+            return cls(**values)
+        except TypeError as e:
+            raise ValueError(f"Incomplete booking job: {e}")
+
+    def course_schedule_ids(self):
+        """
+        Returns the schedule IDs of the courses this job books on.
+        """
+        if self.schedule_ids:
+            return [str(schedule_id) for schedule_id in self.schedule_ids]
+        return schedule_ids_for(self.osprey_only)
+
+    def describe(self):
+        """
+        Returns a log-friendly description that leaves out the password.
+        """
+        return f"{self.kind} {self.date} {self.time_range_start}-{self.time_range_end} for {self.players} player(s) as {self.email}"
+
+
+def load_jobs(path):
+    """
+    Loads a list of booking jobs from a JSON file. Fields missing from an entry
+    fall back to the environment-configured job.
+    """
+    with open(path) as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError(f"Expected a list of jobs in {path}")
+
+    try:
+        defaults = BookingJob.from_env()
+    except ValueError:
+        defaults = None
+
+    jobs = [BookingJob.from_dict(entry, defaults) for entry in entries]
+    logger.info(f"Loaded {len(jobs)} booking jobs from {path}")
+    return jobs
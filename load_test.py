@@ -0,0 +1,213 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import urllib.request
+import urllib.error
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from playwright.async_api import async_playwright
+from jobs import BookingJob
+from book_tee_time import launch_browser, run_booking
+from step_graph import StepError
+from standin_server import StandInState, start_server
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Competing clients give up on a slot after this many attempts
+COMPETITOR_ATTEMPTS = 3
+
+
+def percentiles(values):
+    """
+    p50/p90/p99/max of a list of numbers, or None for each if the list is empty.
+    """
+    ordered = sorted(values)
+    def pick(pct):
+        if not ordered:
+            return None
+        return round(ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))])
+    return {'p50': pick(50), 'p90': pick(90), 'p99': pick(99), 'max': round(ordered[-1]) if ordered else None}
+
+
+def _api_call(base_url, method, path, token=None, form=None, query=None):
+    url = f'{base_url}{path}' + (f'?{urlencode(query)}' if query else '')
+    data = urlencode(form).encode('utf-8') if form is not None else None
+    request = urllib.request.Request(url, data=data, method=method)
+    if token:
+        request.add_header('x-authorization', f'Bearer {token}')
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, json.loads(response.read() or b'null')
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+def run_competitor(base_url, index, date_str, release_at, delay_ms, players):
+    """
+    A competing client: waits for the release plus a reaction delay, then tries to grab
+    one of the earliest slots straight through the API, like another bot would.
+    """
+    reaction = random.lognormvariate(0, 0.5) * delay_ms / 1000
+    time.sleep(max(0, release_at - time.time()) + reaction)
+
+    status, data = _api_call(base_url, 'POST', '/index.php/api/booking/users/login',
+                             form={'username': f'competitor{index}@loadtest.local', 'password': 'x'})
+    if status != 200:
+        return 'login_failed'
+    token = data['jwt']
+
+    query = {'date': datetime.strptime(date_str, '%Y-%m-%d').strftime('%m-%d-%Y'), 'players': players}
+    for _ in range(COMPETITOR_ATTEMPTS):
+        status, slots = _api_call(base_url, 'GET', '/index.php/api/booking/times', query=query)
+        if status == 429:
+            time.sleep(0.2)
+            continue
+        if not slots:
+            return 'sold_out'
+        slot = random.choice(slots[:3])
+        status, hold = _api_call(base_url, 'POST', '/index.php/api/booking/pending_reservation', token,
+                                 form={'time': slot['time'], 'players': players})
+        if status != 200:
+            continue
+        status, _ = _api_call(base_url, 'POST', '/index.php/api/booking/users/reservations', token,
+                              form={'pending_reservation_id': hold['reservation_id']})
+        if status == 200:
+            return 'booked'
+    return 'gave_up'
+
+
+async def run_instance(browser, job):
+    """
+    Runs one copy of the booking flow. Returns how it ended and, on failure, the step it failed in.
+    """
+    started = time.time()
+    outcome = {'email': job.email, 'started_at': started}
+    try:
+        result = await run_booking(browser, job)
+        outcome.update({'status': 'completed', 'time': result.get('time')})
+    except StepError as e:
+        outcome.update({'status': 'failed', 'step': e.step, 'error': f"{type(e.error).__name__}: {str(e.error).splitlines()[0][:120]}"})
+    except Exception as e:
+        outcome.update({'status': 'failed', 'step': None, 'error': f"{type(e).__name__}: {str(e).splitlines()[0][:120] if str(e) else ''}"})
+    outcome['finished_at'] = time.time()
+    return outcome
+
+
+def build_report(args, outcomes, stats, release_at):
+    """
+    Success rate, time-to-booked percentiles (from the release) and failure modes per step.
+    A bot counts as booked only if the stand-in confirmed a reservation for it.
+    """
+    bookings = {booking['email']: booking for booking in stats['bookings']}
+    bot_emails = {outcome['email'] for outcome in outcomes}
+
+    times_to_booked = []
+    failure_modes = {}
+    for outcome in outcomes:
+        booking = bookings.get(outcome['email'])
+        if booking:
+            times_to_booked.append((booking['confirmed_at'] - release_at) * 1000)
+            continue
+        if outcome['status'] == 'failed':
+            step = outcome['step'] or '(outside the flow)'
+            error = outcome['error']
+        else:
+            # The flow clicked through to the end but the stand-in never confirmed the reservation
+            step, error = 'finalize_booking', 'reservation not confirmed'
+        failure_modes.setdefault(step, {})
+        failure_modes[step][error] = failure_modes[step].get(error, 0) + 1
+
+    booked = len(times_to_booked)
+    return {
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'instances': len(outcomes),
+        'booked': booked,
+        'success_rate': round(booked / len(outcomes), 3) if outcomes else None,
+        'time_to_booked_ms': percentiles(times_to_booked),
+        'failure_modes': failure_modes,
+        'competitor_bookings': sum(1 for email in bookings if email not in bot_emails),
+        'server': stats['counters'],
+        'remaining_spots': stats['remaining_spots'],
+    }
+
+
+async def run_load_test(args):
+    release_at = time.time() + args.release_delay
+    date_str = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+    state = StandInState(date_str, slot_count=args.slots, spots_per_slot=args.spots_per_slot, release_at=release_at,
+                         latency_ms=args.latency_ms, latency_sigma=args.latency_sigma, rate_limit=args.rate_limit)
+    server, base_url = start_server(state)
+    os.environ['FOREUP_BASE_URL'] = base_url
+
+    jobs = [BookingJob(email=f'bot{index}@loadtest.local', password='loadtest', date=date_str,
+                       time_range_start=args.time_range_start, time_range_end=args.time_range_end, players=str(args.players))
+            for index in range(args.instances)]
+
+    loop = asyncio.get_running_loop()
+    try:
+        async with async_playwright() as p:
+            browser = await launch_browser(p)
+            try:
+                with ThreadPoolExecutor(max_workers=max(1, args.competitors)) as pool:
+                    competitors = [loop.run_in_executor(pool, run_competitor, base_url, index, date_str, release_at,
+                                                        args.competitor_delay_ms, args.players)
+                                   for index in range(args.competitors)]
+
+                    # The bots start `lead` seconds before the release, like the scheduled run does
+                    await asyncio.sleep(max(0, release_at - args.lead_seconds - time.time()))
+                    logger.info(f"Starting {args.instances} booking flows against {args.competitors} competing clients")
+                    outcomes = await asyncio.gather(*[run_instance(browser, job) for job in jobs])
+                    competitor_results = await asyncio.gather(*competitors)
+            finally:
+                await browser.close()
+    finally:
+        server.shutdown()
+
+    report = build_report(args, outcomes, state.stats(), release_at)
+    report['competitor_outcomes'] = {result: competitor_results.count(result) for result in set(competitor_results)}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the booking flow against a local ForeUp stand-in at release time.")
+    parser.add_argument('--instances', type=int, default=5, help="Copies of the booking flow to run")
+    parser.add_argument('--competitors', type=int, default=50, help="Competing API clients")
+    parser.add_argument('--slots', type=int, default=10, help="Tee times in the inventory")
+    parser.add_argument('--spots-per-slot', type=int, default=4, help="Players per tee time")
+    parser.add_argument('--players', type=int, default=4, help="Players each booking asks for")
+    parser.add_argument('--time-range-start', default='07:00')
+    parser.add_argument('--time-range-end', default='12:00')
+    parser.add_argument('--latency-ms', type=float, default=150, help="Median server latency")
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help="Spread of the log-normal latency")
+    parser.add_argument('--rate-limit', type=int, default=0, help="API requests per second before 429s (0 = unlimited)")
+    parser.add_argument('--release-delay', type=float, default=10, help="Seconds from start until the tee sheet opens")
+    parser.add_argument('--lead-seconds', type=float, default=0, help="How early the bots start before the release")
+    parser.add_argument('--competitor-delay-ms', type=float, default=1500, help="Median competitor reaction time after the release")
+    parser.add_argument('--output', default='load_test_report.json')
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load_test(args))
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    logger.info(f"Booked {report['booked']}/{report['instances']} (success rate {report['success_rate']}), "
+                f"time to booked {report['time_to_booked_ms']}")
+    for step, errors in report['failure_modes'].items():
+        for error, count in errors.items():
+            logger.info(f"  {step}: {error} x{count}")
+    logger.info(f"Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
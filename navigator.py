@@ -0,0 +1,162 @@
+import os
+import asyncio
+import logging
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit, parse_qsl, urlunsplit
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# ForeUp identifiers for the PBC booking site
+DEFAULT_BASE_URL = 'https://foreupsoftware.com'
+COURSE_ID = '21263'
+PARK_RIDGE_SCHEDULE_ID = '7483'
+OSPREY_SCHEDULE_ID = '7480'
+
+# Selectors shared by the click path and the fast path
+PUBLIC_TEE_TIMES_SELECTOR = 'div.booking-classes >> button:has-text("Public Tee Times")'
+TEE_TIME_CARD_SELECTOR = '.time.time-tile-ob-no-details'
+TIMES_API_PATTERN = '**/api/booking/times*'
+TIMES_API_PATH = '/api/booking/times'
+
+
+def booking_base_url():
+    """
+    Returns the ForeUp base URL. FOREUP_BASE_URL overrides it, e.g. to point at a local stand-in server.
+    """
+    return os.getenv('FOREUP_BASE_URL', DEFAULT_BASE_URL).rstrip('/')
+
+
+def booking_page_url():
+    """
+    Returns the booking landing page used by the click path.
+    """
+    return f'{booking_base_url()}/index.php/booking/a/{COURSE_ID}/21#/teetimes'
+
+
+def schedule_ids_for(osprey_only):
+    """
+    Returns the schedule IDs the click path toggles in the sidebar course list.
+    """
+    schedule_ids = [PARK_RIDGE_SCHEDULE_ID]
+    if osprey_only:
+        schedule_ids.append(OSPREY_SCHEDULE_ID)
+    return schedule_ids
+
+
+def build_tee_sheet_url(date_str, players, holes, schedule_ids, booking_class_id=None):
+    """
+    Builds a deep link to the tee sheet with the schedule, date, players and holes
+    already encoded in the hash route.
+    """
+    date_obj = datetime.strptime(date_str, '%Y-%m-%d')
+    route_params = {
+        'date': date_obj.strftime('%m-%d-%Y'),
+        'players': str(players),
+        'holes': str(holes),
+        'schedule_id': schedule_ids[0],
+    }
+    if booking_class_id:
+        route_params['booking_class'] = str(booking_class_id)
+    return f'{booking_base_url()}/index.php/booking/{COURSE_ID}/{schedule_ids[0]}#/teetimes?{urlencode(route_params)}'
+
+
+def rewrite_times_url(url, date_str, players, holes, schedule_ids, booking_class_id=None):
+    """
+    Rewrites a tee sheet times API URL so it carries the target filters. This is the
+    client state the filter buttons and calendar would otherwise produce one click at a time.
+    """
+    date_obj = datetime.strptime(date_str, '%Y-%m-%d')
+    parts = urlsplit(url)
+    params = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+              if key not in ('date', 'players', 'holes', 'schedule_id', 'schedule_ids[]')]
+    params.extend([
+        ('date', date_obj.strftime('%m-%d-%Y')),
+        ('players', str(players)),
+        ('holes', str(holes)),
+        ('schedule_id', schedule_ids[0]),
+    ])
+    params.extend(('schedule_ids[]', schedule_id) for schedule_id in schedule_ids)
+    if booking_class_id:
+        params = [(key, value) for key, value in params if key != 'booking_class']
+        params.append(('booking_class', str(booking_class_id)))
+    return urlunsplit(parts._replace(query=urlencode(params)))
+
+
+async def navigate_fast_path(page, date_str, players, holes, schedule_ids, booking_class_id=None, render_timeout=8000):
+    """
+    Lands directly on the filtered tee sheet. Opens the deep link, injects the filter state
+    into the tee sheet's times request and waits for that request to be answered.
+    Returns True if the filtered tee sheet loaded (even with no tee times on it, e.g. before
+    the release or when sold out), False otherwise.
+    """
+    logger.info("=== FAST PATH NAVIGATION START ===")
+    injected = []
+    times_loaded = asyncio.Event()
+
+    async def inject_filters(route):
+        rewritten = rewrite_times_url(route.request.url, date_str, players, holes, schedule_ids, booking_class_id)
+        logger.info(f"Injecting filter state into times request: {rewritten}")
+        injected.append(rewritten)
+        await route.continue_(url=rewritten)
+
+    def on_response(response):
+        # Every times request goes through inject_filters, so any answer after an injection carries our filters
+        if injected and urlsplit(response.url).path.endswith(TIMES_API_PATH) and response.ok:
+            times_loaded.set()
+
+    page.on('response', on_response)
+    await page.route(TIMES_API_PATTERN, inject_filters)
+    try:
+        url = build_tee_sheet_url(date_str, players, holes, schedule_ids, booking_class_id)
+        logger.info(f"Navigating directly to tee sheet: {url}")
+        await page.goto(url)
+
+        # The booking class picker is only shown when the deep link did not pin a class
+        public_button = page.locator(PUBLIC_TEE_TIMES_SELECTOR)
+        loaded = asyncio.ensure_future(times_loaded.wait())
+        picker = asyncio.ensure_future(public_button.first.wait_for(timeout=render_timeout))
+        try:
+            await asyncio.wait([loaded, picker], timeout=render_timeout / 1000, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            loaded.cancel()
+            picker.cancel()
+            # The picker usually times out on deep links that pin a class; that's expected
+            await asyncio.gather(loaded, picker, return_exceptions=True)
+
+        if not times_loaded.is_set() and await public_button.count() > 0 and await public_button.first.is_visible():
+            logger.info("Booking class picker shown, clicking Public Tee Times")
+            await public_button.first.click()
+            await asyncio.wait_for(times_loaded.wait(), timeout=render_timeout / 1000)
+
+        if not times_loaded.is_set():
+            logger.warning("Tee sheet did not load via fast path.")
+            return False
+        logger.info("Tee sheet loaded via fast path.")
+        return True
+
+    except (PlaywrightTimeoutError, asyncio.TimeoutError):
+        logger.warning("Tee sheet did not load via fast path.")
+        return False
+    except Exception as e:
+        logger.warning(f"Error during fast path navigation: {e}")
+        return False
+    finally:
+        page.remove_listener('response', on_response)
+        logger.info("=== FAST PATH NAVIGATION END ===")
+
+
+async def navigate_to_tee_sheet(page, date_str, players, holes, schedule_ids, click_path, booking_class_id=None):
+    """
+    Tries the fast path first and falls back to the click path if the tee sheet
+    doesn't load. Returns True if the date was already applied by the fast path,
+    in which case the caller can skip the calendar.
+    """
+    if await navigate_fast_path(page, date_str, players, holes, schedule_ids, booking_class_id):
+        return True
+
+    # Leave the times request alone so the click path sees the same page a user would
+    await page.unroute(TIMES_API_PATTERN)
+    logger.info("Falling back to click path navigation")
+    await click_path(page, players, holes, schedule_ids)
+    return False
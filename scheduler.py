@@ -0,0 +1,239 @@
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from dataclasses import replace
+from playwright.async_api import async_playwright
+from jobs import load_jobs
+from book_tee_time import launch_browser, run_booking, run_search, parse_time_range, parse_tee_time_text, SlotUnavailable
+from foreup_api import ReservationUnconfirmed
+from step_graph import StepError
+
+logger = logging.getLogger(__name__)
+
+# Per-account limits: minimum spacing between booking attempts and attempts per run
+DEFAULT_MIN_INTERVAL_SECONDS = 2.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+class AccountRateLimiter:
+    """
+    Spaces out booking attempts per account and caps how many each account makes.
+    """
+
+    def __init__(self, min_interval_seconds=DEFAULT_MIN_INTERVAL_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.min_interval_seconds = min_interval_seconds
+        self.max_attempts = max_attempts
+        self.last_attempt = {}
+        self.attempts = {}
+
+    def exhausted(self, email):
+        return self.attempts.get(email, 0) >= self.max_attempts
+
+    async def acquire(self, email):
+        """
+        Waits until the account may make another attempt. Returns False once it has used up its attempts.
+        """
+        if self.exhausted(email):
+            return False
+        wait = self.last_attempt.get(email, 0) + self.min_interval_seconds - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self.last_attempt[email] = time.monotonic()
+        self.attempts[email] = self.attempts.get(email, 0) + 1
+        return True
+
+
+class BookingScheduler:
+    """
+    Assigns each pending booking job its own target slot from one shared availability snapshot,
+    highest priority first, so our accounts never race each other for the same tee time, and
+    claims them all concurrently. When a claim fails because the slot is gone, that slot is
+    struck off and the jobs not currently claiming are re-planned by priority: jobs whose
+    claims failed around the same time (and are waiting out their account's rate limit)
+    get the remaining slots highest priority first. Other failures retry the same slot.
+
+    `snapshot` is a list of {'date', 'time', 'available_players'} entries; `claim(job)` books
+    the job's target_time and raises if the slot couldn't be booked (SlotUnavailable, possibly
+    wrapped in a StepError, when it is gone).
+    """
+
+    def __init__(self, jobs, snapshot, claim, rate_limiter=None):
+        self.jobs = list(jobs)
+        self.claim = claim
+        self.rate_limiter = rate_limiter or AccountRateLimiter()
+        # Slots are keyed by (date, time of day) so card labels in any format compare equal
+        self.free_slots = {}
+        for slot in snapshot:
+            key = (slot['date'], parse_tee_time_text(slot['time']))
+            self.free_slots[key] = slot
+        self.assigned = {}
+        # Jobs whose claim is in flight or has booked keep their slot through re-planning
+        self.claiming = set()
+        self.finished = set()
+        self.results = [None] * len(self.jobs)
+
+    def _candidates(self, job):
+        start_time_obj, end_time_obj = parse_time_range(job.time_range_start, job.time_range_end)
+        target_players = int(job.players)
+        candidates = [key for key, slot in self.free_slots.items()
+                      if key[0] == job.date and start_time_obj <= key[1] <= end_time_obj
+                      and int(slot['available_players']) >= target_players and key not in self.assigned.values()]
+        return sorted(candidates, key=lambda key: key[1])
+
+    def _assign(self, job_index):
+        """
+        Picks the earliest free slot for the job, or None if nothing is left in its window.
+        """
+        candidates = self._candidates(self.jobs[job_index])
+        if not candidates:
+            self.assigned.pop(job_index, None)
+            return None
+        self.assigned[job_index] = candidates[0]
+        return candidates[0]
+
+    def _by_priority(self, job_indexes):
+        # Descending priority; ties keep the job order
+        return sorted(job_indexes, key=lambda job_index: -self.jobs[job_index].priority)
+
+    def plan(self):
+        """
+        (Re-)assigns distinct slots, by descending priority, to every job that is neither
+        claiming a slot nor finished. Returns {job_index: slot key} for the jobs that have one.
+        """
+        replan = [job_index for job_index in self._by_priority(range(len(self.jobs)))
+                  if job_index not in self.claiming and job_index not in self.finished]
+        for job_index in replan:
+            self.assigned.pop(job_index, None)
+        for job_index in replan:
+            slot = self._assign(job_index)
+            job = self.jobs[job_index]
+            if slot:
+                logger.info(f"Planned {self.free_slots[slot]['time']} on {slot[0]} for {job.email} (priority {job.priority})")
+            else:
+                logger.warning(f"No free slot for {job.describe()}")
+        return dict(self.assigned)
+
+    def _finish(self, job_index, status, **extra):
+        self.finished.add(job_index)
+        # A booked or possibly booked slot stays assigned so no other job is planned onto it
+        if status not in ('booked', 'unconfirmed'):
+            self.assigned.pop(job_index, None)
+        return {'status': status, 'email': self.jobs[job_index].email, **extra}
+
+    async def _attempt(self, job_index):
+        job = self.jobs[job_index]
+        while True:
+            if self.assigned.get(job_index) is None:
+                return self._finish(job_index, 'no_slot')
+            if not await self.rate_limiter.acquire(job.email):
+                return self._finish(job_index, 'rate_limited')
+            # Re-read: a higher-priority job may have taken the slot while this one waited
+            slot = self.assigned.get(job_index)
+            if slot is None:
+                return self._finish(job_index, 'no_slot')
+
+            target = self.free_slots[slot]
+            logger.info(f"Claiming {target['time']} on {slot[0]} for {job.email}")
+            self.claiming.add(job_index)
+            try:
+                result = await self.claim(replace(job, target_time=target['time']))
+                return self._finish(job_index, 'booked', result=result)
+            except Exception as e:
+                self.claiming.discard(job_index)
+                if booking_unconfirmed(e):
+                    # The booking may have gone through; claiming again could book the account twice
+                    logger.error(f"Claim of {target['time']} for {job.email} may have booked, not retrying: {e}")
+                    return self._finish(job_index, 'unconfirmed', error=str(e))
+                if slot_gone(e):
+                    logger.warning(f"{target['time']} is gone, re-planning {job.email}: {e}")
+                    del self.free_slots[slot]
+                else:
+                    # Login failures, timeouts and the like say nothing about the slot; it stays ours
+                    logger.warning(f"Claim of {target['time']} for {job.email} failed, retrying: {e}")
+                self.plan()
+
+    async def run(self):
+        """
+        Plans, then claims every assigned slot concurrently. Returns one result per job, in job order.
+        """
+        self.plan()
+        self.results = await asyncio.gather(*[self._attempt(job_index) for job_index in range(len(self.jobs))])
+        return self.results
+
+
+def _cause(error):
+    return error.error if isinstance(error, StepError) else error
+
+
+def slot_gone(error):
+    """
+    Whether a failed claim means its slot is no longer available.
+    """
+    return isinstance(_cause(error), SlotUnavailable)
+
+
+def booking_unconfirmed(error):
+    """
+    Whether a failed claim got past the commit point, so it may have booked after all.
+    """
+    return isinstance(_cause(error), ReservationUnconfirmed)
+
+
+def snapshot_job(jobs, date):
+    """
+    A search job wide enough to cover every job for the date: the union of their windows
+    and the smallest party, so one tee sheet read serves them all.
+    """
+    date_jobs = [job for job in jobs if job.date == date]
+    start = min(date_jobs, key=lambda job: parse_time_range(job.time_range_start, job.time_range_end)[0])
+    end = max(date_jobs, key=lambda job: parse_time_range(job.time_range_start, job.time_range_end)[1])
+    return replace(date_jobs[0], kind='search', time_range_start=start.time_range_start,
+                   time_range_end=end.time_range_end, players=str(min(int(job.players) for job in date_jobs)),
+                   osprey_only=any(job.osprey_only for job in date_jobs))
+
+
+async def schedule_bookings(jobs, min_interval_seconds=DEFAULT_MIN_INTERVAL_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Takes one availability snapshot per date, then books every job on its own slot.
+    """
+    async with async_playwright() as p:
+        browser = await launch_browser(p)
+        try:
+            snapshot = []
+            for date in sorted({job.date for job in jobs}):
+                snapshot += await run_search(browser, snapshot_job(jobs, date))
+            logger.info(f"Availability snapshot has {len(snapshot)} slots")
+
+            scheduler = BookingScheduler(jobs, snapshot, lambda job: run_booking(browser, job),
+                                         AccountRateLimiter(min_interval_seconds, max_attempts))
+            return await scheduler.run()
+        finally:
+            await browser.close()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Book for several accounts at once without them competing for the same slot.")
+    parser.add_argument('jobs_file', help="JSON file with a list of booking jobs (with optional priority)")
+    parser.add_argument('--min-interval', type=float, default=DEFAULT_MIN_INTERVAL_SECONDS, help="Seconds between attempts per account")
+    parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS, help="Booking attempts per account")
+    parser.add_argument('--output', default='scheduler_results.json')
+    args = parser.parse_args()
+
+    jobs = [job for job in load_jobs(args.jobs_file) if job.kind == 'book']
+    if not jobs:
+        logger.info("No booking jobs to schedule")
+        return 0
+
+    results = asyncio.run(schedule_bookings(jobs, args.min_interval, args.max_attempts))
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+    logger.info(f"Booked {sum(1 for result in results if result['status'] == 'booked')}/{len(jobs)}, results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
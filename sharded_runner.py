@@ -0,0 +1,205 @@
+import os
+import sys
+import json
+import time
+import queue
+import asyncio
+import logging
+import argparse
+import multiprocessing
+from playwright.async_api import async_playwright
+from dotenv import load_dotenv
+from jobs import load_jobs
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# How often a worker checks whether another worker already booked its job's group
+CANCEL_POLL_INTERVAL = 0.5
+# Jobs a worker runs at once on its browser, each in its own context
+DEFAULT_JOBS_PER_WORKER = 4
+
+
+async def _watch_group(group, taken_groups, task):
+    """
+    Cancels the running job as soon as another job in its group has booked the slot.
+    """
+    while not task.done():
+        if group in taken_groups:
+            logger.info(f"Group '{group}' was booked by another job, cancelling")
+            task.cancel()
+            return
+        await asyncio.sleep(CANCEL_POLL_INTERVAL)
+
+
+async def _run_job(browser, job_index, job, worker_id, result_queue, taken_groups, group_claims, claim_lock):
+    """
+    Runs one job on the worker's browser and reports its result.
+    """
+    # Imported here so each spawned worker sets up the booking module in its own process
+    from book_tee_time import run_job
+    from commit_guard import GroupCommitGuard, CommitLost
+    from step_graph import StepError
+
+    result = {'job_index': job_index, 'worker': worker_id, 'group': job.group, 'kind': job.kind}
+    if job.group and job.group in taken_groups:
+        logger.info(f"Skipping job {job_index}, group '{job.group}' already booked")
+        result['status'] = 'cancelled'
+        result_queue.put(result)
+        return
+
+    logger.info(f"Worker {worker_id} starting job {job_index}: {job.describe()}")
+    started = time.monotonic()
+    # Claimed right before the final commit, so two jobs of a group never both book.
+    # A job that finds the group claimed waits there until the claimant books or gives up
+    guard = GroupCommitGuard(job.group, job_index, group_claims, claim_lock) if job.group else None
+    task = asyncio.create_task(run_job(browser, job, guard))
+    watcher = asyncio.create_task(_watch_group(job.group, taken_groups, task)) if job.group else None
+    try:
+        result['result'] = await task
+        result['status'] = 'booked' if job.kind == 'book' else 'found'
+    except asyncio.CancelledError:
+        result['status'] = 'cancelled'
+    except Exception as e:
+        lost = isinstance(e.error if isinstance(e, StepError) else e, CommitLost)
+        if lost and job.group in taken_groups:
+            logger.info(f"Job {job_index} stopped, group '{job.group}' was booked by another job")
+            result['status'] = 'cancelled'
+        else:
+            logger.error(f"Job {job_index} failed: {e}")
+            result['status'] = 'failed'
+            result['error'] = str(e)
+    finally:
+        if watcher:
+            watcher.cancel()
+    result['duration'] = round(time.monotonic() - started, 3)
+    result_queue.put(result)
+
+
+async def _worker_loop(worker_id, job_queue, result_queue, taken_groups, group_claims, claim_lock, jobs_per_worker):
+    """
+    Runs jobs from the queue on this worker's own Playwright instance and browser, up to
+    `jobs_per_worker` at once (each in its own context), until it receives the stop sentinel.
+    """
+    # Imported here so each spawned worker sets up the booking module in its own process
+    from book_tee_time import launch_browser
+
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(jobs_per_worker)
+    running = set()
+    async with async_playwright() as p:
+        browser = await launch_browser(p)
+        logger.info(f"Worker {worker_id} launched its browser")
+        try:
+            while True:
+                # Only take a job off the shared queue when there is room for it, so idle workers get the rest
+                await slots.acquire()
+                item = await loop.run_in_executor(None, job_queue.get)
+                if item is None:
+                    slots.release()
+                    break
+                job_index, job = item
+
+                task = asyncio.create_task(_run_job(browser, job_index, job, worker_id, result_queue,
+                                                    taken_groups, group_claims, claim_lock))
+                running.add(task)
+                task.add_done_callback(running.discard)
+                task.add_done_callback(lambda _: slots.release())
+
+            if running:
+                await asyncio.gather(*running)
+        finally:
+            await browser.close()
+
+
+def _worker_main(worker_id, job_queue, result_queue, taken_groups, group_claims, claim_lock, jobs_per_worker):
+    asyncio.run(_worker_loop(worker_id, job_queue, result_queue, taken_groups, group_claims, claim_lock, jobs_per_worker))
+
+
+def run_sharded(jobs, workers=None, jobs_per_worker=DEFAULT_JOBS_PER_WORKER):
+    """
+    Splits the jobs across a pool of worker processes, each with its own browser running
+    up to `jobs_per_worker` jobs at once.
+    Only the first booking job of a group to reach the final commit may book; when it
+    succeeds, the other jobs in its group are cancelled.
+    Returns one result dict per job, in job order.
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+    jobs_per_worker = max(1, jobs_per_worker)
+    logger.info(f"Running {len(jobs)} jobs on {workers} worker processes, up to {jobs_per_worker} at once each")
+
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Manager() as manager:
+        taken_groups = manager.dict()
+        # Which job claimed each group's commit; checked and set under the lock by the workers
+        group_claims = manager.dict()
+        claim_lock = manager.Lock()
+        job_queue = ctx.Queue()
+        result_queue = ctx.Queue()
+
+        for job_index, job in enumerate(jobs):
+            job_queue.put((job_index, job))
+        for _ in range(workers):
+            job_queue.put(None)
+
+        processes = [
+            ctx.Process(target=_worker_main, args=(worker_id, job_queue, result_queue, taken_groups, group_claims, claim_lock, jobs_per_worker), name=f'worker-{worker_id}')
+            for worker_id in range(workers)
+        ]
+        for process in processes:
+            process.start()
+
+        results = [None] * len(jobs)
+        pending = len(jobs)
+        while pending:
+            try:
+                result = result_queue.get(timeout=1)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    logger.error("All workers exited before every job reported a result")
+                    break
+                continue
+
+            if result['status'] == 'booked' and result['group'] and result['group'] not in taken_groups:
+                taken_groups[result['group']] = result['job_index']
+                logger.info(f"Job {result['job_index']} booked group '{result['group']}'")
+            results[result['job_index']] = result
+            pending -= 1
+
+        for process in processes:
+            process.join()
+
+    for job_index, result in enumerate(results):
+        if result is None:
+            results[job_index] = {'job_index': job_index, 'status': 'failed', 'error': 'worker exited'}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run booking and search jobs across worker processes.")
+    parser.add_argument('jobs_file', help="JSON file with a list of booking jobs")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes (defaults to the CPU count)")
+    parser.add_argument('--jobs-per-worker', type=int, default=DEFAULT_JOBS_PER_WORKER, help="Jobs each worker runs at once")
+    parser.add_argument('--output', default='sharded_results.json', help="Where to write the job results")
+    args = parser.parse_args()
+
+    jobs = load_jobs(args.jobs_file)
+    if not jobs:
+        logger.info("No jobs to run")
+        return 0
+
+    results = run_sharded(jobs, args.workers, args.jobs_per_worker)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"Results written to {args.output}")
+
+    return 0 if all(result['status'] != 'failed' for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
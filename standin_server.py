@@ -0,0 +1,398 @@
+import json
+import math
+import time
+import random
+import logging
+import secrets
+import threading
+from datetime import datetime, timedelta
+from http.cookies import SimpleCookie
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+logger = logging.getLogger(__name__)
+
+# A local stand-in for the ForeUp booking site. It serves pages with the same selectors the
+# bot drives and the booking API endpoints, with a finite slot inventory, a release time,
+# injected latency and rate limiting, so the bot can be load-tested under contention.
+
+TEE_SHEET_HTML = """<!DOCTYPE html>
+<html><head><title>Stand-in Tee Times</title></head>
+<body>
+<div class="booking-classes"><button>Public Tee Times</button></div>
+<div id="app" style="display: none">
+  <div id="js-course-list">
+    <div class="filter-course-option" data-schedule-id="7483"><div class="filter-course-select-button-bordered js-filter-course-select-toggle">Park Ridge</div></div>
+    <div class="filter-course-option" data-schedule-id="7480"><div class="filter-course-select-button-bordered js-filter-course-select-toggle">Osprey Point</div></div>
+  </div>
+  <div class="ob-filters-btn-group players">
+    <a class="ob-filters-btn" data-value="1">1</a><a class="ob-filters-btn" data-value="2">2</a>
+    <a class="ob-filters-btn" data-value="3">3</a><a class="ob-filters-btn" data-value="4">4</a>
+  </div>
+  <div class="ob-filters-btn-group holes">
+    <a class="ob-filters-btn" data-value="9">9</a><a class="ob-filters-btn" data-value="18">18</a>
+  </div>
+  <div class="datepicker-days"><table><tbody id="calendar"></tbody></table></div>
+  <div id="times"></div>
+</div>
+<script>
+const pad = n => String(n).padStart(2, '0');
+const fmt = d => `${pad(d.getMonth() + 1)}-${pad(d.getDate())}-${d.getFullYear()}`;
+const state = {players: 4, holes: 18, schedules: [], date: fmt(new Date())};
+
+function label(time) {
+  let [h, m] = time.split(' ')[1].split(':').map(Number);
+  const suffix = h < 12 ? 'am' : 'pm';
+  h = h % 12 || 12;
+  return `${h}:${pad(m)}${suffix}`;
+}
+
+function load() {
+  const params = new URLSearchParams({date: state.date, players: state.players, holes: state.holes,
+                                      schedule_id: state.schedules[0] || '7483', booking_class: '', api_key: 'no_limits'});
+  state.schedules.forEach(id => params.append('schedule_ids[]', id));
+  fetch('/index.php/api/booking/times?' + params).then(r => r.ok ? r.json() : []).then(render).catch(() => render([]));
+}
+
+function render(slots) {
+  const times = document.getElementById('times');
+  times.innerHTML = '';
+  slots.forEach(slot => {
+    const card = document.createElement('div');
+    card.className = 'time time-tile-ob-no-details';
+    card.innerHTML = `<span class="times-booking-start-time-label">${label(slot.time)}</span>` +
+                     `<span class="time-summary-ob-player-count">${slot.available_spots} Players</span>`;
+    card.onclick = () => {
+      const query = new URLSearchParams({time: slot.time, schedule_id: slot.schedule_id});
+      window.open('/booking_form?' + query, '_blank');
+    };
+    times.appendChild(card);
+  });
+}
+
+function calendar() {
+  const today = new Date();
+  const first = new Date(today.getFullYear(), today.getMonth(), 1);
+  const body = document.getElementById('calendar');
+  let row;
+  for (let i = 0; i < 42; i++) {
+    if (i % 7 === 0) { row = document.createElement('tr'); body.appendChild(row); }
+    const day = new Date(first.getFullYear(), first.getMonth(), 1 + i);
+    const cell = document.createElement('td');
+    cell.textContent = day.getDate();
+    const past = day < new Date(today.getFullYear(), today.getMonth(), today.getDate());
+    cell.className = 'day' + (past ? ' disabled' : '') + (day.getMonth() !== today.getMonth() ? ' new' : '');
+    cell.onclick = () => { if (!past) { state.date = fmt(day); load(); } };
+    row.appendChild(cell);
+  }
+}
+
+document.querySelector('.booking-classes button').onclick = () => {
+  document.getElementById('app').style.display = 'block';
+  calendar();
+  load();
+};
+document.querySelectorAll('.js-filter-course-select-toggle').forEach(toggle => toggle.onclick = () => {
+  const id = toggle.parentElement.dataset.scheduleId;
+  state.schedules = state.schedules.includes(id) ? state.schedules.filter(s => s !== id) : state.schedules.concat([id]);
+  load();
+});
+document.querySelectorAll('.players .ob-filters-btn').forEach(b => b.onclick = () => { state.players = b.dataset.value; load(); });
+document.querySelectorAll('.holes .ob-filters-btn').forEach(b => b.onclick = () => { state.holes = b.dataset.value; load(); });
+</script>
+</body></html>
+"""
+
+BOOKING_FORM_HTML = """<!DOCTYPE html>
+<html><head><title>Stand-in Booking</title></head>
+<body>
+<div id="login" style="display: none">
+  <input type="text" id="login_email"><input type="password" id="login_password">
+  <button id="login-button">Log In</button>
+</div>
+<div id="form" style="display: none">
+  <input type="radio" name="holes" id="holes-nine" value="9"><label for="holes-nine">9</label>
+  <input type="radio" name="holes" id="holes-eighteen" value="18"><label for="holes-eighteen">18</label>
+  <input type="radio" name="players" id="players-one" value="1"><label for="players-one">1</label>
+  <input type="radio" name="players" id="players-two" value="2"><label for="players-two">2</label>
+  <input type="radio" name="players" id="players-three" value="3"><label for="players-three">3</label>
+  <input type="radio" name="players" id="players-four" value="4"><label for="players-four">4</label>
+  <button class="ob-book-time-continue-button">Book Time</button>
+  <div id="error"></div>
+</div>
+<div id="select-payment-type-modal" style="display: none">
+  <input type="radio" name="payment" value="facility"> Pay at facility
+  <button class="peg-btn-primary">Book Time</button>
+</div>
+<div id="result"></div>
+<script>
+const query = new URLSearchParams(location.search);
+let reservationId = null;
+const show = id => document.getElementById(id).style.display = 'block';
+const hide = id => document.getElementById(id).style.display = 'none';
+const checked = name => (document.querySelector(`input[name="${name}"]:checked`) || {}).value;
+
+if (document.cookie.includes('session=')) { show('form'); } else { show('login'); }
+
+document.getElementById('login-button').onclick = () => {
+  const form = new URLSearchParams({username: document.getElementById('login_email').value,
+                                    password: document.getElementById('login_password').value});
+  fetch('/index.php/api/booking/users/login', {method: 'POST', body: form}).then(r => {
+    if (r.ok) { hide('login'); show('form'); }
+  });
+};
+
+document.querySelector('.ob-book-time-continue-button').onclick = () => {
+  const form = new URLSearchParams({time: query.get('time'), schedule_id: query.get('schedule_id'),
+                                    players: checked('players') || '1', holes: checked('holes') || '18'});
+  fetch('/index.php/api/booking/pending_reservation', {method: 'POST', body: form}).then(async r => {
+    const data = await r.json().catch(() => ({}));
+    if (r.ok && data.reservation_id) { reservationId = data.reservation_id; show('select-payment-type-modal'); }
+    else { document.getElementById('error').textContent = data.msg || ('HTTP ' + r.status); }
+  });
+};
+
+document.querySelector('#select-payment-type-modal button').onclick = () => {
+  const body = JSON.stringify({pending_reservation_id: reservationId, payment_type: checked('payment')});
+  fetch('/index.php/api/booking/users/reservations', {method: 'POST', body, headers: {'content-type': 'application/json'}})
+    .then(async r => {
+      const data = await r.json().catch(() => ({}));
+      hide('select-payment-type-modal');
+      document.getElementById('result').textContent = r.ok ? 'Booked ' + data.TTID : (data.msg || 'HTTP ' + r.status);
+    });
+};
+</script>
+</body></html>
+"""
+
+
+class StandInState:
+    """
+    The stand-in's inventory, holds, sessions and counters. Shared by all handler threads.
+    """
+
+    def __init__(self, date_str, slot_count=20, spots_per_slot=4, first_tee_time='07:00', interval_minutes=8,
+                 release_at=None, latency_ms=150, latency_sigma=0.5, rate_limit=0):
+        self.lock = threading.Lock()
+        self.date_str = date_str
+        self.release_at = release_at or time.time()
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.rate_limit = rate_limit
+        self.recent_requests = []
+
+        start = datetime.strptime(f'{date_str} {first_tee_time}', '%Y-%m-%d %H:%M')
+        self.slots = {}
+        for index in range(slot_count):
+            slot_time = (start + timedelta(minutes=interval_minutes * index)).strftime('%Y-%m-%d %H:%M')
+            self.slots[slot_time] = {
+                'time': slot_time,
+                'schedule_id': 7483,
+                'teesheet_side_id': 1,
+                'booking_class_id': 1,
+                'available_spots': spots_per_slot,
+                'green_fee': 40.0,
+                'cart_fee': 20.0,
+            }
+
+        self.sessions = {}
+        self.holds = {}
+        self.bookings = []
+        self.counters = {'requests': 0, 'rate_limited': 0, 'holds_granted': 0, 'holds_rejected': 0,
+                         'holds_released': 0, 'confirmed': 0, 'confirm_rejected': 0}
+
+    def count(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+
+    def latency(self):
+        """
+        Draws a server latency in seconds from a log-normal distribution around the median.
+        """
+        if not self.latency_ms:
+            return 0
+        return random.lognormvariate(math.log(self.latency_ms), self.latency_sigma) / 1000
+
+    def allow_request(self):
+        """
+        Sliding one-second window across all API calls. Returns False when over the limit.
+        """
+        if not self.rate_limit:
+            return True
+        now = time.time()
+        with self.lock:
+            self.recent_requests = [t for t in self.recent_requests if now - t < 1]
+            if len(self.recent_requests) >= self.rate_limit:
+                self.counters['rate_limited'] += 1
+                return False
+            self.recent_requests.append(now)
+            return True
+
+    def times(self, date_str, players):
+        if time.time() < self.release_at:
+            return []
+        if datetime.strptime(date_str, '%m-%d-%Y').strftime('%Y-%m-%d') != self.date_str:
+            return []
+        with self.lock:
+            return [dict(slot) for slot in self.slots.values() if slot['available_spots'] >= players]
+
+    def login(self, email):
+        token = secrets.token_hex(16)
+        with self.lock:
+            self.sessions[token] = email
+        return token
+
+    def hold(self, token, slot_time, players):
+        with self.lock:
+            slot = self.slots.get(slot_time)
+            if token not in self.sessions or slot is None or time.time() < self.release_at or slot['available_spots'] < players:
+                self.counters['holds_rejected'] += 1
+                return None
+            slot['available_spots'] -= players
+            hold_id = f'TTID_{secrets.token_hex(8)}'
+            self.holds[hold_id] = {'token': token, 'time': slot_time, 'players': players}
+            self.counters['holds_granted'] += 1
+            return hold_id
+
+    def release(self, token, hold_id):
+        with self.lock:
+            hold = self.holds.get(hold_id)
+            if not hold or hold['token'] != token:
+                return False
+            del self.holds[hold_id]
+            self.slots[hold['time']]['available_spots'] += hold['players']
+            self.counters['holds_released'] += 1
+            return True
+
+    def confirm(self, token, hold_id):
+        with self.lock:
+            hold = self.holds.get(hold_id)
+            if not hold or hold['token'] != token:
+                self.counters['confirm_rejected'] += 1
+                return None
+            del self.holds[hold_id]
+            booking = {'email': self.sessions[token], 'time': hold['time'], 'players': hold['players'],
+                       'reservation_id': hold_id, 'confirmed_at': time.time()}
+            self.bookings.append(booking)
+            self.counters['confirmed'] += 1
+            return booking
+
+    def stats(self):
+        with self.lock:
+            return {'counters': dict(self.counters), 'bookings': list(self.bookings),
+                    'remaining_spots': sum(slot['available_spots'] for slot in self.slots.values())}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    state = None  # Set on the subclass created by start_server
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send(self, status, body, content_type='application/json', headers=None):
+        payload = body if isinstance(body, bytes) else (json.dumps(body) if content_type == 'application/json' else body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length).decode('utf-8') if length else ''
+        if 'json' in (self.headers.get('Content-Type') or ''):
+            return json.loads(raw or '{}')
+        return {key: values[0] for key, values in parse_qs(raw).items()}
+
+    def _token(self):
+        authorization = self.headers.get('x-authorization') or ''
+        if authorization.startswith('Bearer '):
+            return authorization[len('Bearer '):]
+        cookie = SimpleCookie(self.headers.get('Cookie') or '')
+        return cookie['session'].value if 'session' in cookie else None
+
+    def _api(self):
+        """
+        Applies the rate limit and latency every API call pays. Returns False if the call was rejected.
+        """
+        self.state.count('requests')
+        if not self.state.allow_request():
+            self._send(429, {'success': False, 'msg': 'Too many requests'})
+            return False
+        time.sleep(self.state.latency())
+        return True
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path.startswith('/index.php/booking/'):
+            self._send(200, TEE_SHEET_HTML, 'text/html')
+        elif parts.path == '/booking_form':
+            self._send(200, BOOKING_FORM_HTML, 'text/html')
+        elif parts.path == '/index.php/api/booking/times':
+            if not self._api():
+                return
+            params = {key: values[0] for key, values in parse_qs(parts.query).items()}
+            self._send(200, self.state.times(params.get('date', ''), int(params.get('players') or 1)))
+        elif parts.path == '/stats':
+            self._send(200, self.state.stats())
+        else:
+            self._send(404, {'msg': 'Not found'})
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        if not path.startswith('/index.php/api/'):
+            self._send(404, {'msg': 'Not found'})
+            return
+        if not self._api():
+            return
+        body = self._body()
+
+        if path == '/index.php/api/booking/users/login':
+            if not body.get('username') or not body.get('password'):
+                self._send(401, {'success': False, 'msg': 'Invalid credentials'})
+                return
+            token = self.state.login(body['username'])
+            self._send(200, {'jwt': token, 'logged_in': True}, headers={'Set-Cookie': f'session={token}; Path=/'})
+
+        elif path == '/index.php/api/booking/pending_reservation':
+            hold_id = self.state.hold(self._token(), body.get('time'), int(body.get('players') or 1))
+            if hold_id:
+                self._send(200, {'success': True, 'reservation_id': hold_id})
+            else:
+                self._send(409, {'success': False, 'msg': 'This time is no longer available'})
+
+        elif path == '/index.php/api/booking/users/reservations':
+            booking = self.state.confirm(self._token(), body.get('pending_reservation_id'))
+            if booking:
+                self._send(200, {'success': True, 'TTID': booking['reservation_id']})
+            else:
+                self._send(409, {'success': False, 'msg': 'Reservation hold expired'})
+
+        else:
+            self._send(404, {'msg': 'Not found'})
+
+    def do_DELETE(self):
+        path = urlsplit(self.path).path
+        prefix = '/index.php/api/booking/pending_reservation/'
+        if not path.startswith(prefix):
+            self._send(404, {'msg': 'Not found'})
+            return
+        if not self._api():
+            return
+        released = self.state.release(self._token(), path[len(prefix):])
+        self._send(200 if released else 404, {'success': released})
+
+
+def start_server(state, host='127.0.0.1', port=0):
+    """
+    Starts the stand-in on a background thread. Returns the server and its base URL.
+    """
+    handler = type('BoundStandInHandler', (StandInHandler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://{host}:{server.server_address[1]}'
+    logger.info(f"Stand-in booking server listening on {base_url}")
+    return server, base_url
@@ -0,0 +1,178 @@
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StepError(Exception):
+    """
+    Raised when a required step fails after its retries. Carries the step name so
+    callers can tell where the flow broke.
+    """
+
+    def __init__(self, step, error):
+        super().__init__(f"Step '{step}' failed: {error}")
+        self.step = step
+        self.error = error
+
+
+class Step:
+    """
+    One node of a step graph. `action` is an async callable that receives the results
+    of the steps completed so far, keyed by step name.
+    """
+
+    def __init__(self, name, action, deps=(), retries=0, optional=False, budgeted=True):
+        self.name = name
+        self.action = action
+        self.deps = tuple(deps)
+        self.retries = retries
+        self.optional = optional  # A failed optional step is logged and skipped instead of failing the graph
+        # Unbudgeted steps are never cut short by a learned whole-step budget, e.g. ones that commit a booking
+        self.budgeted = budgeted
+
+
+class StepGraph:
+    """
+    A declarative set of steps with dependencies. Steps whose dependencies are met run concurrently.
+    """
+
+    def __init__(self):
+        self.steps = {}
+
+    def add(self, name, action, deps=(), retries=0, optional=False, budgeted=True):
+        if name in self.steps:
+            raise ValueError(f"Duplicate step '{name}'")
+        self.steps[name] = Step(name, action, deps, retries, optional, budgeted)
+        return self
+
+    def validate(self):
+        """
+        Checks that every dependency exists, that required steps don't depend on optional
+        ones, and that there are no cycles.
+        """
+        for step in self.steps.values():
+            for dep in step.deps:
+                if dep not in self.steps:
+                    raise ValueError(f"Step '{step.name}' depends on unknown step '{dep}'")
+                if self.steps[dep].optional and not step.optional:
+                    raise ValueError(f"Required step '{step.name}' depends on optional step '{dep}'")
+
+        visited, visiting = set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle in step graph at '{name}'")
+            visiting.add(name)
+            for dep in self.steps[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.steps:
+            visit(name)
+
+
+class GraphRun:
+    """
+    Results and per-step timing of one graph execution. Timings are in ms relative to the start of the run.
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.timings = {}
+        self.started = time.monotonic()
+
+    def _elapsed_ms(self):
+        return round((time.monotonic() - self.started) * 1000)
+
+    def log_timings(self):
+        for name, timing in sorted(self.timings.items(), key=lambda item: item[1]['start_ms']):
+            logger.info(f"Step {name}: {timing['status']} at {timing['start_ms']}ms, took {timing['duration_ms']}ms ({timing['attempts']} attempt(s))")
+
+
+async def _run_step(step, run, timeouts, listeners):
+    timing = {'start_ms': run._elapsed_ms(), 'attempts': 0, 'status': 'running'}
+    run.timings[step.name] = timing
+    for listener in listeners:
+        listener.step_started(step.name)
+
+    status = 'failed'
+    try:
+        while True:
+            timing['attempts'] += 1
+            try:
+                if timeouts and step.budgeted:
+                    result = await timeouts.run(step.name, lambda: step.action(run.results))
+                else:
+                    result = await step.action(run.results)
+                status = 'done'
+                return result
+            except asyncio.CancelledError:
+                status = 'cancelled'
+                raise
+            except Exception as e:
+                if timing['attempts'] > step.retries:
+                    raise
+                logger.warning(f"Step '{step.name}' failed (attempt {timing['attempts']}), retrying: {e}")
+    finally:
+        timing['status'] = status
+        timing['duration_ms'] = run._elapsed_ms() - timing['start_ms']
+        for listener in listeners:
+            listener.step_finished(step.name, status)
+
+
+async def run_graph(graph, timeouts=None, listeners=()):
+    """
+    Runs the graph, starting every step as soon as its dependencies are done. Returns the
+    GraphRun with each step's result and timing. If a required step fails, the steps still
+    running are cancelled and a StepError is raised.
+
+    `timeouts` (a TimeoutManager) gives each attempt of a budgeted step its learned budget. `listeners` get
+    step_started(name) and step_finished(name, status) calls.
+    """
+    graph.validate()
+    run = GraphRun()
+    pending = dict(graph.steps)
+    running = {}
+    skipped = set()
+
+    try:
+        while pending or running:
+            # Start every step whose dependencies are all done
+            for name, step in list(pending.items()):
+                if any(dep in skipped for dep in step.deps):
+                    logger.info(f"Skipping step '{name}', a dependency was skipped")
+                    skipped.add(name)
+                    del pending[name]
+                elif all(dep in run.results for dep in step.deps):
+                    running[asyncio.create_task(_run_step(step, run, timeouts, listeners))] = step
+                    del pending[name]
+
+            if not running:
+                if pending:
+                    raise ValueError(f"Steps can never run: {', '.join(pending)}")
+                break
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                step = running.pop(task)
+                error = task.exception()
+                if error is None:
+                    run.results[step.name] = task.result()
+                elif step.optional:
+                    logger.warning(f"Optional step '{step.name}' failed: {error}")
+                    skipped.add(step.name)
+                else:
+                    raise StepError(step.name, error) from error
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+        run.log_timings()
+
+    return run
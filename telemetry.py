@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TELEMETRY_PATH = 'network_telemetry.json'
+
+# How many requests to list in the slowest/largest sections of the summary
+TOP_N = 10
+
+# The stages whose blocking XHRs are called out in the summary
+BLOCKING_STAGES = ('select_tee_time', 'finalize_booking')
+XHR_RESOURCE_TYPES = ('xhr', 'fetch')
+
+
+def telemetry_enabled():
+    """
+    Network telemetry is opt-in via NETWORK_TELEMETRY=true.
+    """
+    return os.getenv('NETWORK_TELEMETRY', 'false').lower() == 'true'
+
+
+def _phase(end, start):
+    # Playwright reports -1 for phases that didn't happen (e.g. a reused connection has no DNS or connect)
+    if end is None or start is None or end < 0 or start < 0:
+        return None
+    return round(end - start, 1)
+
+
+def timing_phases(timing):
+    """
+    Splits a Playwright request timing dict into DNS, connect, TLS, TTFB and download durations (ms).
+    """
+    return {
+        'dns_ms': _phase(timing.get('domainLookupEnd'), timing.get('domainLookupStart')),
+        'connect_ms': _phase(timing.get('connectEnd'), timing.get('connectStart')),
+        'tls_ms': _phase(timing.get('connectEnd'), timing.get('secureConnectionStart')),
+        'ttfb_ms': _phase(timing.get('responseStart'), timing.get('requestStart')),
+        'download_ms': _phase(timing.get('responseEnd'), timing.get('responseStart')),
+        'total_ms': _phase(timing.get('responseEnd'), 0),
+    }
+
+
+class NetworkTelemetry:
+    """
+    Records every request made in a browser context with its timing phases, size, resource
+    type and the booking stage(s) running when it was issued, plus the API calls passed
+    through track(). Also acts as a step graph listener, which is how it knows the current stage.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.records = {}
+        self.active_stages = []
+        self.stage_windows = {}
+        self._pending = set()
+
+    def _elapsed_ms(self):
+        return round((time.monotonic() - self.started) * 1000)
+
+    def attach(self, context):
+        """
+        Hooks the context's request events; they cover every page in the context, including the login tab.
+        """
+        context.on('request', self._on_request)
+        context.on('requestfinished', self._on_request_done)
+        context.on('requestfailed', self._on_request_failed)
+
+    async def track(self, method, url, call):
+        """
+        Records a request made through an APIRequestContext (the HTTP login, slot hold, reservation
+        and hold release), which doesn't fire the context's request events. `call()` sends it and
+        returns the APIResponse.
+        """
+        record = {
+            'url': url,
+            'method': method,
+            'resource_type': 'fetch',
+            'api': True,
+            'stages': list(self.active_stages),
+            'start_ms': self._elapsed_ms(),
+            'end_ms': None,
+            'status': None,
+            'failure': None,
+        }
+        self.records[object()] = record
+        try:
+            response = await call()
+        except Exception as e:
+            record['end_ms'] = self._elapsed_ms()
+            record['failure'] = str(e)
+            raise
+        record['end_ms'] = self._elapsed_ms()
+        record['total_ms'] = record['end_ms'] - record['start_ms']
+        record['status'] = response.status
+        try:
+            record['response_bytes'] = len(await response.body())
+        except Exception as e:
+            logger.debug(f"Could not read the body size for {url}: {e}")
+        return response
+
+    # Step graph listener interface
+    def step_started(self, name):
+        self.active_stages.append(name)
+        self.stage_windows[name] = {'start_ms': self._elapsed_ms(), 'end_ms': None}
+
+    def step_finished(self, name, status):
+        if name in self.active_stages:
+            self.active_stages.remove(name)
+        self.stage_windows[name]['end_ms'] = self._elapsed_ms()
+
+    def _on_request(self, request):
+        self.records[request] = {
+            'url': request.url,
+            'method': request.method,
+            'resource_type': request.resource_type,
+            'stages': list(self.active_stages),
+            'start_ms': self._elapsed_ms(),
+            'end_ms': None,
+            'status': None,
+            'failure': None,
+        }
+
+    def _on_request_done(self, request):
+        record = self.records.get(request)
+        if record is None:
+            return
+        record['end_ms'] = self._elapsed_ms()
+        record.update(timing_phases(request.timing))
+        task = asyncio.ensure_future(self._collect_response(request, record))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def _on_request_failed(self, request):
+        record = self.records.get(request)
+        if record is None:
+            return
+        record['end_ms'] = self._elapsed_ms()
+        record['failure'] = request.failure
+
+    async def _collect_response(self, request, record):
+        try:
+            sizes = await request.sizes()
+            record['request_bytes'] = sizes.get('requestHeadersSize', 0) + sizes.get('requestBodySize', 0)
+            record['response_bytes'] = sizes.get('responseHeadersSize', 0) + sizes.get('responseBodySize', 0)
+            response = await request.response()
+            record['status'] = response.status if response else None
+        except Exception as e:
+            logger.debug(f"Could not read sizes for {request.url}: {e}")
+
+    def _blocking(self, stage):
+        """
+        XHR/fetch requests issued while the stage ran that finished before it did: the ones it waited on.
+        """
+        window = self.stage_windows.get(stage)
+        if not window or window['end_ms'] is None:
+            return []
+        return [record for record in self.records.values()
+                if record['resource_type'] in XHR_RESOURCE_TYPES and stage in record['stages']
+                and record['end_ms'] is not None and record['end_ms'] <= window['end_ms']]
+
+    async def summarize(self):
+        """
+        Builds the per-run summary: every request, the slowest and largest ones, totals
+        per stage and the XHRs that blocked the tee time selection and the final booking.
+        """
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+        records = sorted(self.records.values(), key=lambda record: record['start_ms'])
+        finished = [record for record in records if record['end_ms'] is not None]
+
+        def duration(record):
+            return record.get('total_ms') or (record['end_ms'] - record['start_ms'])
+
+        by_stage = {}
+        for record in records:
+            for stage in record['stages'] or ['(none)']:
+                entry = by_stage.setdefault(stage, {'requests': 0, 'bytes': 0, 'xhr': 0})
+                entry['requests'] += 1
+                entry['bytes'] += record.get('response_bytes') or 0
+                if record['resource_type'] in XHR_RESOURCE_TYPES:
+                    entry['xhr'] += 1
+
+        blocking = {}
+        for stage in BLOCKING_STAGES:
+            stage_blocking = sorted(self._blocking(stage), key=duration, reverse=True)
+            blocking[stage] = {
+                'window': self.stage_windows.get(stage),
+                'requests': [{'url': record['url'], 'method': record['method'], 'status': record['status'],
+                              'duration_ms': duration(record)} for record in stage_blocking],
+            }
+
+        return {
+            'request_count': len(records),
+            'failed_count': sum(1 for record in records if record['failure']),
+            'total_response_bytes': sum(record.get('response_bytes') or 0 for record in records),
+            'slowest': sorted(finished, key=duration, reverse=True)[:TOP_N],
+            'largest': sorted(finished, key=lambda record: record.get('response_bytes') or 0, reverse=True)[:TOP_N],
+            'by_stage': by_stage,
+            'stages': self.stage_windows,
+            'blocking': blocking,
+            'requests': records,
+        }
+
+    async def write(self, path=None):
+        """
+        Writes the summary as JSON and logs the headline numbers. Failures are logged, never raised.
+        """
+        path = path or os.getenv('NETWORK_TELEMETRY_PATH', DEFAULT_TELEMETRY_PATH)
+        try:
+            summary = await self.summarize()
+            with open(path, 'w') as f:
+                json.dump(summary, f, indent=2, sort_keys=True)
+            logger.info(f"Network telemetry for {summary['request_count']} requests written to {path}")
+            for record in summary['slowest'][:3]:
+                logger.info(f"  slow: {record['method']} {record['url']} {record.get('total_ms')}ms ({record['resource_type']}, {', '.join(record['stages']) or 'no stage'})")
+            for stage, entry in summary['blocking'].items():
+                logger.info(f"  {stage} waited on {len(entry['requests'])} XHR(s)")
+        except Exception as e:
+            logger.error(f"Could not write network telemetry: {e}")
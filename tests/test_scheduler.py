@@ -0,0 +1,107 @@
+import asyncio
+import unittest
+from jobs import BookingJob
+from scheduler import AccountRateLimiter, BookingScheduler
+from book_tee_time import SlotUnavailable
+from foreup_api import ReservationUnconfirmed
+from step_graph import StepError
+
+DATE = '2026-10-20'
+
+
+def make_job(email, priority=0):
+    return BookingJob(email=email, password='x', date=DATE, time_range_start='07:00',
+                      time_range_end='08:00', players='4', priority=priority)
+
+
+def make_snapshot(*times):
+    return [{'date': DATE, 'time': time_text, 'available_players': 4} for time_text in times]
+
+
+def run_scheduler(jobs, snapshot, claim, min_interval_seconds=0):
+    scheduler = BookingScheduler(jobs, snapshot, claim, AccountRateLimiter(min_interval_seconds=min_interval_seconds, max_attempts=3))
+    return asyncio.run(scheduler.run())
+
+
+def booked_times(results):
+    return [result['result'] if result['status'] == 'booked' else result['status'] for result in results]
+
+
+class BookingSchedulerTest(unittest.TestCase):
+
+    def test_plan_assigns_distinct_slots_by_priority(self):
+        jobs = [make_job('low@example.com'), make_job('high@example.com', priority=5)]
+        scheduler = BookingScheduler(jobs, make_snapshot('7:00am', '7:08am'), claim=None)
+        plan = scheduler.plan()
+        self.assertEqual(plan[1][1].strftime('%H:%M'), '07:00')
+        self.assertEqual(plan[0][1].strftime('%H:%M'), '07:08')
+
+    def test_gone_slots_are_replanned_by_priority(self):
+        async def claim(job):
+            await asyncio.sleep(0.01)
+            if job.target_time in ('7:00am', '7:08am'):
+                raise SlotUnavailable("gone")
+            return job.target_time
+
+        # Both claims fail together; the one slot left goes to the higher priority, whatever the job order
+        jobs = [make_job('p0@example.com'), make_job('p5@example.com', priority=5)]
+        results = run_scheduler(jobs, make_snapshot('7:00am', '7:08am', '7:16am'), claim, min_interval_seconds=0.05)
+        self.assertEqual(booked_times(results), ['no_slot', '7:16am'])
+
+    def test_gone_slot_inside_step_error_is_struck_off(self):
+        claimed = []
+
+        async def claim(job):
+            claimed.append(job.target_time)
+            if job.target_time == '7:00am':
+                raise StepError('select_tee_time', SlotUnavailable("gone"))
+            return job.target_time
+
+        results = run_scheduler([make_job('a@example.com')], make_snapshot('7:00am', '7:08am'), claim)
+        self.assertEqual(booked_times(results), ['7:08am'])
+        self.assertEqual(claimed, ['7:00am', '7:08am'])
+
+    def test_other_failures_retry_the_same_slot(self):
+        claimed = []
+
+        async def claim(job):
+            claimed.append(job.target_time)
+            if len(claimed) == 1:
+                raise StepError('open_booking_page', TimeoutError("navigation timed out"))
+            return job.target_time
+
+        results = run_scheduler([make_job('a@example.com')], make_snapshot('7:00am', '7:08am'), claim)
+        self.assertEqual(booked_times(results), ['7:00am'])
+        self.assertEqual(claimed, ['7:00am', '7:00am'])
+
+    def test_unconfirmed_booking_is_not_retried(self):
+        claimed = []
+
+        async def claim(job):
+            claimed.append(job.target_time)
+            raise StepError('submit_booking', ReservationUnconfirmed("sent but not confirmed"))
+
+        jobs = [make_job('a@example.com'), make_job('b@example.com')]
+        results = run_scheduler(jobs, make_snapshot('7:00am', '7:08am'), claim)
+        self.assertEqual([result['status'] for result in results], ['unconfirmed', 'unconfirmed'])
+        self.assertEqual(sorted(claimed), ['7:00am', '7:08am'])
+
+    def test_all_priorities_claim_concurrently(self):
+        in_flight = []
+        peak = []
+
+        async def claim(job):
+            in_flight.append(job.email)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.remove(job.email)
+            return job.target_time
+
+        jobs = [make_job('a@example.com', priority=5), make_job('b@example.com')]
+        results = run_scheduler(jobs, make_snapshot('7:00am', '7:08am'), claim)
+        self.assertEqual(booked_times(results), ['7:00am', '7:08am'])
+        self.assertEqual(max(peak), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import asyncio
+import unittest
+from step_graph import StepGraph, StepError, run_graph
+
+
+def run(graph, **kwargs):
+    return asyncio.run(run_graph(graph, **kwargs))
+
+
+def recorder(log, name, result=None, delay=0):
+    async def action(results):
+        log.append(f'{name}:start')
+        await asyncio.sleep(delay)
+        log.append(f'{name}:end')
+        return result
+    return action
+
+
+class Listener:
+
+    def __init__(self):
+        self.finished = {}
+
+    def step_started(self, name):
+        pass
+
+    def step_finished(self, name, status):
+        self.finished[name] = status
+
+
+class StepGraphTest(unittest.TestCase):
+
+    def test_steps_wait_for_their_dependencies(self):
+        log = []
+        graph = StepGraph()
+        graph.add('book', recorder(log, 'book'), deps=['select'])
+        graph.add('select', recorder(log, 'select', result='7:00am', delay=0.01), deps=['open'])
+        graph.add('open', recorder(log, 'open', result='page'))
+
+        result = run(graph)
+        self.assertEqual(log, ['open:start', 'open:end', 'select:start', 'select:end', 'book:start', 'book:end'])
+        self.assertEqual(result.results, {'open': 'page', 'select': '7:00am', 'book': None})
+
+    def test_independent_steps_run_concurrently(self):
+        log = []
+        graph = StepGraph()
+        graph.add('open', recorder(log, 'open'))
+        graph.add('course_a', recorder(log, 'course_a', delay=0.01), deps=['open'])
+        graph.add('course_b', recorder(log, 'course_b', delay=0.01), deps=['open'])
+        graph.add('select_day', recorder(log, 'select_day'), deps=['course_a', 'course_b'])
+
+        run(graph)
+        self.assertEqual(sorted(log[2:4]), ['course_a:start', 'course_b:start'])
+        self.assertEqual(log[-2:], ['select_day:start', 'select_day:end'])
+
+    def test_failed_attempts_are_retried(self):
+        attempts = []
+
+        async def flaky(results):
+            attempts.append(len(attempts) + 1)
+            if len(attempts) < 3:
+                raise RuntimeError("not yet")
+            return 'done'
+
+        graph = StepGraph()
+        graph.add('flaky', flaky, retries=2)
+        result = run(graph)
+        self.assertEqual(result.results['flaky'], 'done')
+        self.assertEqual(result.timings['flaky']['attempts'], 3)
+
+    def test_failure_after_retries_raises_step_error(self):
+        async def broken(results):
+            raise RuntimeError("card not found")
+
+        graph = StepGraph()
+        graph.add('select_tee_time', broken, retries=1)
+        with self.assertRaises(StepError) as caught:
+            run(graph)
+        self.assertEqual(caught.exception.step, 'select_tee_time')
+        self.assertIsInstance(caught.exception.error, RuntimeError)
+        self.assertIs(caught.exception.__cause__, caught.exception.error)
+
+    def test_required_failure_cancels_running_siblings(self):
+        cancelled = asyncio.Event()
+        listener = Listener()
+
+        async def slow(results):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        async def broken(results):
+            await asyncio.sleep(0.01)
+            raise RuntimeError("login failed")
+
+        graph = StepGraph()
+        graph.add('slow', slow)
+        graph.add('broken', broken)
+        graph.add('after', recorder([], 'after'), deps=['slow', 'broken'])
+        with self.assertRaises(StepError) as caught:
+            run(graph, listeners=[listener])
+        self.assertEqual(caught.exception.step, 'broken')
+        self.assertTrue(cancelled.is_set())
+        self.assertEqual(listener.finished, {'slow': 'cancelled', 'broken': 'failed'})
+
+    def test_failed_optional_step_skips_its_dependents(self):
+        log = []
+
+        async def broken(results):
+            raise RuntimeError("no dropdown")
+
+        graph = StepGraph()
+        graph.add('toggle_course', broken, optional=True)
+        graph.add('check_course', recorder(log, 'check_course'), deps=['toggle_course'], optional=True)
+        graph.add('select_day', recorder(log, 'select_day'))
+
+        result = run(graph)
+        self.assertEqual(log, ['select_day:start', 'select_day:end'])
+        self.assertNotIn('toggle_course', result.results)
+
+    def test_invalid_graphs_are_rejected(self):
+        async def noop(results):
+            return None
+
+        unknown = StepGraph().add('book', noop, deps=['missing'])
+        cycle = StepGraph().add('a', noop, deps=['b']).add('b', noop, deps=['a'])
+        required_on_optional = StepGraph().add('toggle', noop, optional=True).add('book', noop, deps=['toggle'])
+        for graph in (unknown, cycle, required_on_optional):
+            with self.assertRaises(ValueError):
+                run(graph)
+        with self.assertRaises(ValueError):
+            StepGraph().add('a', noop).add('a', noop)
+
+
+if __name__ == '__main__':
+    unittest.main()
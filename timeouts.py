@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_PATH = 'timeout_history.json'
+
+# A step needs this many past samples before its learned timeout replaces the fixed one
+MIN_SAMPLES = 5
+# Only the most recent samples per step are kept, so the budgets follow the site as it changes
+MAX_SAMPLES = 50
+# Learned timeout = percentile of past latencies * factor + margin, never below the floor
+PERCENTILE = 95
+FACTOR = 1.5
+MARGIN_MS = 500
+MIN_TIMEOUT_MS = 1000
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when the overall run deadline leaves no time for another attempt.
+    """
+
+
+def percentile(samples, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    ordered = sorted(samples)
+    rank = max(1, int(round(pct / 100 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class TimeoutManager:
+    """
+    Hands out per-step timeouts learned from past runs and enforces an overall run deadline.
+    Without enough history, or with adaptive timeouts disabled, steps get their fixed defaults.
+    """
+
+    def __init__(self, history_path=DEFAULT_HISTORY_PATH, adaptive=True, deadline_seconds=None):
+        self.history_path = history_path
+        self.adaptive = adaptive
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+        self.history = self._load() if adaptive else {}
+        self.samples = {}
+
+    @classmethod
+    def from_env(cls):
+        """
+        ADAPTIVE_TIMEOUTS=true turns on learning, TIMEOUT_HISTORY_PATH sets where samples are kept
+        and RUN_DEADLINE_SECONDS bounds the whole run.
+        """
+        adaptive = os.getenv('ADAPTIVE_TIMEOUTS', 'false').lower() == 'true'
+        deadline_seconds = os.getenv('RUN_DEADLINE_SECONDS')
+        return cls(
+            history_path=os.getenv('TIMEOUT_HISTORY_PATH', DEFAULT_HISTORY_PATH),
+            adaptive=adaptive,
+            deadline_seconds=float(deadline_seconds) if deadline_seconds else None,
+        )
+
+    def _load(self):
+        try:
+            with open(self.history_path) as f:
+                history = json.load(f)
+            logger.info(f"Loaded timeout history for {len(history)} steps from {self.history_path}")
+            return history
+        except FileNotFoundError:
+            logger.info(f"No timeout history at {self.history_path}, using fixed timeouts")
+            return {}
+        except Exception as e:
+            logger.warning(f"Could not read timeout history {self.history_path}: {e}")
+            return {}
+
+    def remaining_ms(self):
+        """
+        Milliseconds left before the run deadline, or None without a deadline.
+        """
+        if self.deadline is None:
+            return None
+        return max(0, int((self.deadline - time.monotonic()) * 1000))
+
+    def timeout(self, step, default_ms):
+        """
+        Returns the timeout for a step in ms: learned from history when there is enough of it,
+        otherwise the fixed default, and never more than what is left of the run deadline.
+        """
+        timeout_ms = default_ms
+        samples = self.history.get(step, [])
+        if self.adaptive and len(samples) >= MIN_SAMPLES:
+            learned_ms = int(percentile(samples, PERCENTILE) * FACTOR + MARGIN_MS)
+            learned_ms = max(MIN_TIMEOUT_MS, learned_ms)
+            timeout_ms = min(learned_ms, default_ms) if default_ms else learned_ms
+
+        remaining_ms = self.remaining_ms()
+        if remaining_ms is not None:
+            if remaining_ms <= 0:
+                raise DeadlineExceeded(f"Run deadline reached before step '{step}'")
+            timeout_ms = min(timeout_ms, remaining_ms) if timeout_ms else remaining_ms
+        return timeout_ms
+
+    def record(self, step, elapsed_ms):
+        """
+        Records how long a successful step took.
+        """
+        if not self.adaptive:
+            return
+        self.samples.setdefault(step, []).append(round(elapsed_ms))
+
+    @asynccontextmanager
+    async def step(self, step, default_ms):
+        """
+        Yields the timeout for a step and records its latency if it completes.
+        """
+        timeout_ms = self.timeout(step, default_ms)
+        started = time.monotonic()
+        yield timeout_ms
+        self.record(step, (time.monotonic() - started) * 1000)
+
+    async def run(self, step, action, default_ms=None):
+        """
+        Runs `action()` within the step's budget, abandoning it when it goes over.
+        """
+        timeout_ms = self.timeout(step, default_ms)
+        started = time.monotonic()
+        try:
+            if timeout_ms:
+                result = await asyncio.wait_for(action(), timeout_ms / 1000)
+            else:
+                result = await action()
+        except asyncio.TimeoutError:
+            logger.warning(f"Step '{step}' went over its {timeout_ms}ms budget")
+            raise
+        self.record(step, (time.monotonic() - started) * 1000)
+        return result
+
+    async def wait(self, step, wait, default_ms):
+        """
+        Runs a pure wait, `wait(timeout_ms)` (e.g. a wait_for_selector), within the step's budget.
+        A wait has no side effects, so when it goes over a learned budget it is retried for the
+        rest of the fixed default, as far as the run deadline allows. A learned budget flags a slow
+        wait early but never fails one the fixed timeout would have let through.
+        """
+        started = time.monotonic()
+        timeout_ms = self.timeout(step, default_ms)
+        while True:
+            try:
+                result = await wait(timeout_ms)
+                break
+            except PlaywrightTimeoutError as e:
+                left_ms = default_ms - int((time.monotonic() - started) * 1000)
+                if left_ms <= 0:
+                    raise
+                remaining_ms = self.remaining_ms()
+                if remaining_ms is not None:
+                    if remaining_ms <= 0:
+                        raise DeadlineExceeded(f"Run deadline reached while waiting in step '{step}'") from e
+                    left_ms = min(left_ms, remaining_ms)
+                logger.warning(f"Step '{step}' went over its {timeout_ms}ms budget, waiting up to {left_ms}ms more")
+                timeout_ms = left_ms
+        self.record(step, (time.monotonic() - started) * 1000)
+        return result
+
+    def save(self):
+        """
+        Merges this run's samples into the history file. Re-reads the file first so
+        concurrent runs don't drop each other's samples.
+        """
+        if not self.adaptive or not self.samples:
+            return
+        history = self._load()
+        for step, samples in self.samples.items():
+            history[step] = (history.get(step, []) + samples)[-MAX_SAMPLES:]
+        try:
+            with open(self.history_path, 'w') as f:
+                json.dump(history, f, indent=2, sort_keys=True)
+            logger.info(f"Saved timeout history for {len(self.samples)} steps to {self.history_path}")
+        except Exception as e:
+            logger.warning(f"Could not save timeout history {self.history_path}: {e}")
+
+
+# Used when no manager is passed in: fixed timeouts, no deadline, nothing persisted
+FIXED_TIMEOUTS = TimeoutManager(adaptive=False)
@@ -0,0 +1,346 @@
+import os
+import sys
+import json
+import zipfile
+import logging
+import argparse
+
+logger = logging.getLogger(__name__)
+
+# Gaps between actions shorter than this are bookkeeping, not waiting
+IDLE_GAP_THRESHOLD_MS = 250
+
+# The action that ends the critical path: the final "Book Time" click in the payment modal
+FINAL_ACTION_MARKER = 'Book Time'
+
+
+def tracing_enabled():
+    """
+    Tracing is opt-in via TRACE=true.
+    """
+    return os.getenv('TRACE', 'false').lower() == 'true'
+
+
+async def start_tracing(context):
+    """
+    Starts recording a Playwright trace on the context.
+    """
+    logger.info("Starting Playwright trace")
+    await context.tracing.start(screenshots=True, snapshots=True)
+
+
+async def stop_tracing(context, trace_path='trace.zip', report_path='trace_report.json'):
+    """
+    Stops the trace, saves it and writes the critical-path report next to it.
+    Report failures are logged, never raised, so they can't mask the booking result.
+    """
+    await context.tracing.stop(path=trace_path)
+    logger.info(f"Playwright trace saved to {trace_path}")
+    try:
+        report = build_report(trace_path)
+        write_report(report, report_path)
+        log_summary(report)
+    except Exception as e:
+        logger.error(f"Could not build trace report: {e}")
+
+
+def _read_jsonl(archive, suffix):
+    events = []
+    for name in archive.namelist():
+        if name.endswith(suffix):
+            for line in archive.read(name).decode('utf-8').splitlines():
+                if line.strip():
+                    events.append(json.loads(line))
+    return events
+
+
+def _action_target(params):
+    for key in ('selector', 'url', 'path'):
+        if params.get(key):
+            return str(params[key])
+    return None
+
+
+def load_actions(archive):
+    """
+    Returns the API calls recorded in the trace with their start/end times (ms, monotonic).
+    Handles both the before/after event format and the older single "action" format.
+    """
+    actions = {}
+    for event in _read_jsonl(archive, '.trace'):
+        event_type = event.get('type')
+        if event_type == 'before' and event.get('apiName'):
+            actions[event['callId']] = {
+                'name': event['apiName'],
+                'target': _action_target(event.get('params') or {}),
+                'start': event['startTime'],
+                'end': None,
+                'error': None,
+            }
+        elif event_type == 'after' and event.get('callId') in actions:
+            action = actions[event['callId']]
+            action['end'] = event.get('endTime')
+            if event.get('error'):
+                action['error'] = (event['error'].get('error') or event['error']).get('message') if isinstance(event['error'], dict) else str(event['error'])
+        elif event_type == 'action' and event.get('metadata', {}).get('apiName'):
+            metadata = event['metadata']
+            actions[metadata.get('id', len(actions))] = {
+                'name': metadata['apiName'],
+                'target': _action_target(metadata.get('params') or {}),
+                'start': metadata['startTime'],
+                'end': metadata.get('endTime'),
+                'error': (metadata.get('error') or {}).get('error', {}).get('message'),
+            }
+
+    # Calls that never finished (e.g. the run was killed) end where the trace ends
+    finished = [action['end'] for action in actions.values() if action['end'] is not None]
+    trace_end = max(finished) if finished else 0
+    for action in actions.values():
+        if action['end'] is None:
+            action['end'] = trace_end
+    ordered = sorted(actions.values(), key=lambda action: action['start'])
+
+    # Element handle clicks carry no selector; they act on what the preceding wait resolved
+    for previous, action in zip(ordered, ordered[1:]):
+        if action['target'] is None and action['name'].endswith('click') and previous['name'].replace('_', '').lower().endswith('waitforselector'):
+            action['target'] = previous['target']
+    return ordered
+
+
+def load_requests(archive):
+    """
+    Returns the network requests recorded in the trace with their start/end times (ms, monotonic).
+    """
+    requests = []
+    for event in _read_jsonl(archive, '.network'):
+        if event.get('type') != 'resource-snapshot':
+            continue
+        snapshot = event['snapshot']
+        start = snapshot.get('_monotonicTime')
+        if start is None:
+            continue
+        response = snapshot.get('response') or {}
+        requests.append({
+            'url': snapshot['request']['url'],
+            'method': snapshot['request'].get('method'),
+            'status': response.get('status'),
+            'size': (response.get('content') or {}).get('size'),
+            'start': start,
+            'end': start + max(snapshot.get('time') or 0, 0),
+        })
+    return sorted(requests, key=lambda request: request['start'])
+
+
+def _align_request_clock(requests, actions):
+    """
+    Some trace versions record request start times in seconds rather than ms. Scale them
+    if that is what puts the requests inside the window covered by the actions.
+    """
+    if not requests:
+        return requests
+    first, last = actions[0]['start'], max(action['end'] for action in actions)
+    def inside(scale):
+        return sum(1 for request in requests if first <= request['start'] * scale <= last)
+    if inside(1000) > inside(1):
+        for request in requests:
+            duration = request['end'] - request['start']
+            request['start'] *= 1000
+            request['end'] = request['start'] + duration
+    return requests
+
+
+def _waited_on(action, requests):
+    """
+    Requests that were in flight during the action and finished before it did.
+    """
+    return [request for request in requests
+            if request['start'] < action['end'] and request['end'] > action['start'] and request['end'] <= action['end']]
+
+
+def _idle_gaps(actions, origin):
+    gaps = []
+    covered_until = None
+    previous = None
+    for action in actions:
+        if covered_until is not None and action['start'] - covered_until >= IDLE_GAP_THRESHOLD_MS:
+            gaps.append({
+                'after': previous['name'],
+                'before': action['name'],
+                'start_ms': round(covered_until - origin),
+                'duration_ms': round(action['start'] - covered_until),
+            })
+        if covered_until is None or action['end'] > covered_until:
+            covered_until = action['end']
+            previous = action
+    return gaps
+
+
+def _critical_path(actions, requests, origin):
+    """
+    Walks back from the final "Book Time" click to the first goto. Each step's predecessor is
+    the action that finished last before it started, i.e. the one that gated it.
+    """
+    gotos = [action for action in actions if action['name'].endswith('goto')]
+    finals = [action for action in actions if FINAL_ACTION_MARKER in (action['target'] or '') and action['name'].endswith('click')]
+    if not gotos:
+        return None
+    first = gotos[0]
+    last = finals[-1] if finals else max(actions, key=lambda action: action['end'])
+
+    chain = [last]
+    current = last
+    while current is not first:
+        candidates = [action for action in actions
+                      if action['end'] <= current['start'] and action['start'] >= first['start'] and action is not current]
+        if not candidates:
+            break
+        current = max(candidates, key=lambda action: action['end'])
+        chain.append(current)
+    chain.reverse()
+
+    segments = []
+    for index, action in enumerate(chain):
+        if index > 0:
+            gap = action['start'] - chain[index - 1]['end']
+            if gap > 0:
+                segments.append({'kind': 'idle', 'start_ms': round(chain[index - 1]['end'] - origin), 'duration_ms': round(gap)})
+        waited = _waited_on(action, requests)
+        slowest = max(waited, key=lambda request: request['end'] - request['start']) if waited else None
+        segments.append({
+            'kind': 'action',
+            'name': action['name'],
+            'target': action['target'],
+            'start_ms': round(action['start'] - origin),
+            'duration_ms': round(action['end'] - action['start']),
+            'slowest_request': _request_entry(slowest, origin) if slowest else None,
+        })
+
+    return {
+        'from': first['name'],
+        'to': f"{last['name']} {last['target'] or ''}".strip(),
+        'complete': chain[0] is first and bool(finals),
+        'duration_ms': round(last['end'] - first['start']),
+        'idle_ms': sum(segment['duration_ms'] for segment in segments if segment['kind'] == 'idle'),
+        'segments': segments,
+    }
+
+
+def _request_entry(request, origin):
+    return {
+        'url': request['url'],
+        'method': request['method'],
+        'status': request['status'],
+        'size': request['size'],
+        'start_ms': round(request['start'] - origin),
+        'duration_ms': round(request['end'] - request['start']),
+    }
+
+
+def build_report(trace_path):
+    """
+    Parses a Playwright trace and builds the critical-path report. Times are in ms relative
+    to the first recorded action, so reports from different runs line up.
+    """
+    with zipfile.ZipFile(trace_path) as archive:
+        actions = load_actions(archive)
+        requests = load_requests(archive)
+
+    if not actions:
+        raise ValueError(f"No actions recorded in {trace_path}")
+    origin = actions[0]['start']
+    requests = _align_request_clock(requests, actions)
+
+    report_actions = []
+    for index, action in enumerate(actions):
+        report_actions.append({
+            'index': index,
+            'name': action['name'],
+            'target': action['target'],
+            'start_ms': round(action['start'] - origin),
+            'duration_ms': round(action['end'] - action['start']),
+            'error': action['error'],
+            'waited_on': [_request_entry(request, origin) for request in _waited_on(action, requests)],
+        })
+
+    return {
+        'trace': os.path.basename(trace_path),
+        'total_ms': round(max(action['end'] for action in actions) - origin),
+        'action_count': len(actions),
+        'request_count': len(requests),
+        'actions': report_actions,
+        'idle_gaps': _idle_gaps(actions, origin),
+        'critical_path': _critical_path(actions, requests, origin),
+    }
+
+
+def write_report(report, report_path):
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    logger.info(f"Trace report written to {report_path}")
+
+
+def log_summary(report):
+    critical_path = report['critical_path']
+    if not critical_path:
+        logger.info("Trace report: no goto found, critical path not available")
+        return
+    logger.info(f"Critical path {critical_path['from']} -> {critical_path['to']}: {critical_path['duration_ms']}ms ({critical_path['idle_ms']}ms idle)")
+    for segment in critical_path['segments']:
+        if segment['kind'] == 'idle':
+            logger.info(f"  idle {segment['duration_ms']}ms")
+        else:
+            logger.info(f"  {segment['name']} {segment['target'] or ''} {segment['duration_ms']}ms")
+
+
+def diff_reports(old, new):
+    """
+    Compares the critical path of two reports step by step. Returns a list of
+    {step, old_ms, new_ms, delta_ms} entries plus the totals.
+    """
+    def step_durations(report):
+        durations = {}
+        critical_path = report.get('critical_path') or {'segments': []}
+        for segment in critical_path['segments']:
+            key = 'idle' if segment['kind'] == 'idle' else f"{segment['name']} {segment['target'] or ''}".strip()
+            durations[key] = durations.get(key, 0) + segment['duration_ms']
+        return durations
+
+    old_steps, new_steps = step_durations(old), step_durations(new)
+    steps = []
+    for key in sorted(set(old_steps) | set(new_steps)):
+        old_ms, new_ms = old_steps.get(key), new_steps.get(key)
+        steps.append({'step': key, 'old_ms': old_ms, 'new_ms': new_ms,
+                      'delta_ms': (new_ms or 0) - (old_ms or 0)})
+    old_total = (old.get('critical_path') or {}).get('duration_ms')
+    new_total = (new.get('critical_path') or {}).get('duration_ms')
+    return {'steps': steps, 'old_total_ms': old_total, 'new_total_ms': new_total,
+            'delta_ms': (new_total or 0) - (old_total or 0)}
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Build or diff critical-path reports from Playwright traces.")
+    parser.add_argument('inputs', nargs='+', help="A trace.zip to report on, or two report JSON files with --diff")
+    parser.add_argument('--output', default='trace_report.json', help="Where to write the report")
+    parser.add_argument('--diff', action='store_true', help="Diff two existing reports instead")
+    args = parser.parse_args()
+
+    if args.diff:
+        if len(args.inputs) != 2:
+            parser.error("--diff takes exactly two report files")
+        with open(args.inputs[0]) as f:
+            old = json.load(f)
+        with open(args.inputs[1]) as f:
+            new = json.load(f)
+        json.dump(diff_reports(old, new), sys.stdout, indent=2, sort_keys=True)
+        print()
+        return 0
+
+    report = build_report(args.inputs[0])
+    write_report(report, args.output)
+    log_summary(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())